@@ -0,0 +1,79 @@
+""" Resident memory of the stock assets under each CPU geometry residency policy.
+
+Every policy runs in its own process with a hidden GL window, loading the
+models and heightmaps of assets.json:
+
+    copy:    CPU copies kept in process memory after the upload (the old Mesh)
+    mapped:  memory-mapped views of the cache files kept (keepGeometry=True)
+    discard: nothing kept after the upload (the default)
+
+Run it twice: the first run also builds the caches.
+
+Usage: python benchmarks/geometry_memory.py [assets.json]
+"""
+import json
+import os
+import subprocess
+import sys
+from os.path import dirname, abspath
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+POLICIES = ["copy", "mapped", "discard"]
+
+def rss() -> int:
+    # resident set size in bytes (Linux), peak size elsewhere
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def load(policy: str, assetsPath: str) -> None:
+    import numpy as np
+    import pygame as pg
+
+    from core import HeightMapTerrain, Model, Vertex
+
+    with open(assetsPath) as file:
+        assets = json.load(file)
+
+    pg.init()
+    pg.display.set_mode((64, 64), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    before = rss()
+
+    kept = []
+    for name, asset in assets.get("models", {}).items():
+        model = Model(asset["path"], asset.get("vertexFormat", Vertex.FORMAT_FLOAT), keepGeometry=policy != "discard")
+        if policy == "copy":
+            model.vertices = np.array(model.vertices)
+            model.indices = np.array(model.indices)
+        kept.append(model)
+
+    for name, asset in assets.get("heightmaps", {}).items():
+        mode = asset.get("mode", HeightMapTerrain.MODE_MESH)
+        if mode in (HeightMapTerrain.MODE_MESH, HeightMapTerrain.MODE_TEXTURE, HeightMapTerrain.MODE_COMPACT):
+            terrain = HeightMapTerrain(asset["path"], mode)
+            if policy == "copy":
+                terrain.heights = np.array(terrain.heights)
+            kept.append(terrain)
+
+    after = rss()
+    print("  %-8s before %7.1f MB, after %7.1f MB (+%.1f MB)" % (policy, before / 2**20, after / 2**20, (after - before) / 2**20))
+    pg.quit()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--policy":
+        load(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    assetsPath = sys.argv[1] if len(sys.argv) > 1 else "assets.json"
+    print("RSS around loading the assets of", assetsPath)
+    for policy in POLICIES:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--policy", policy, assetsPath], check=True)
@@ -0,0 +1,97 @@
+""" Compare the per-vertex model import with the vectorized one, and the
+assimp import with a warm start from the model cache.
+
+Usage: python benchmarks/model_load.py [model.obj ...]
+"""
+import sys
+import time
+from os.path import dirname, abspath
+
+import numpy as np
+
+import glm
+import pyassimp
+from pyassimp.postprocess import *
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.cache import CacheFile, HashFile, HashKey, ReadCache
+from core.mesh import Vertex
+from core.model import ArraysFromAssimpMesh, Model
+
+FLAGS = Model.PROCESSING_FLAGS
+
+def legacyArrays(mesh) -> tuple[np.ndarray, np.ndarray]:
+    # the original Model.__processMesh and Mesh.__init__, minus the GL upload
+    vertices = []
+    indices = []
+
+    for i in range(len(mesh.vertices)):
+        position = glm.vec3(mesh.vertices[i][0], mesh.vertices[i][1], mesh.vertices[i][2])
+
+        normal = glm.vec3(0,0,0)
+        if len(mesh.normals) > 0:
+            normal = glm.vec3(mesh.normals[i][0], mesh.normals[i][1], mesh.normals[i][2])
+
+        texCoord = glm.vec2(0,0)
+        if len(mesh.texturecoords) > 0 and mesh.texturecoords[0] is not None:
+            texCoord = glm.vec2(mesh.texturecoords[0][i][0], mesh.texturecoords[0][i][1])
+
+        vertices.append(Vertex(position,normal,texCoord))
+
+    for face in mesh.faces:
+        for i in face:
+            indices.append(i)
+
+    data = []
+    for v in vertices:
+        data.extend(v.array.to_list())
+
+    data = glm.array(np.array(data, dtype=np.float32))
+    indices = glm.array.from_numbers(glm.uint32, *indices)
+
+    return np.frombuffer(data.to_bytes(), dtype=np.float32), np.frombuffer(indices.to_bytes(), dtype=np.uint32)
+
+def meshes(node):
+    yield from node.meshes
+    for child in node.children:
+        yield from meshes(child)
+
+def timeit(function, sceneMeshes):
+    start = time.perf_counter()
+    result = [function(mesh) for mesh in sceneMeshes]
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["assets/models/backpack/backpack.obj", "assets/models/capsule/capsule.obj"]
+
+    for path in paths:
+        start = time.perf_counter()
+        with pyassimp.load(path, processing=FLAGS) as scene:
+            importTime = time.perf_counter() - start
+            sceneMeshes = list(meshes(scene.rootnode))
+
+            legacyTime, legacy = timeit(legacyArrays, sceneMeshes)
+            newTime, new = timeit(ArraysFromAssimpMesh, sceneMeshes)
+
+        same = all(
+            np.array_equal(legacyVertices, newVertices.reshape(-1)) and np.array_equal(legacyIndices, newIndices)
+            for (legacyVertices, legacyIndices), (newVertices, newIndices) in zip(legacy, new)
+        )
+        numVertices = sum(len(vertices) for vertices, _ in new)
+
+        print(path, "(%d meshes, %d vertices)" % (len(sceneMeshes), numVertices))
+        print("  legacy:     %8.3f s" % legacyTime)
+        print("  vectorized: %8.3f s (%.0fx)" % (newTime, legacyTime / newTime))
+        print("  identical buffers:", same)
+
+        # the cache is written by the first Model(path) in the application
+        start = time.perf_counter()
+        cached = ReadCache(CacheFile("models", path, HashKey(HashFile(path), FLAGS, Model.CACHE_VERSION)))
+        cacheTime = time.perf_counter() - start
+
+        print("  assimp import + vectorized: %8.3f s" % (importTime + newTime))
+        if cached is None:
+            print("  cache: not built yet, run the application once")
+        else:
+            print("  cache (hash + map):         %8.3f s" % cacheTime)
@@ -0,0 +1,47 @@
+""" Time to get the image based lighting maps of the stock skyboxes, convolved
+on every CPU core (cold, the ibl cache entry removed first) and mapped from
+the cache (warm), as on every later start of the application.
+
+No GL window is needed, the maps are only computed and read back.
+
+Usage: python benchmarks/sky_lighting.py [skybox directory ...]
+"""
+import os
+import sys
+import time
+from glob import glob
+from os import listdir
+from os.path import dirname, abspath, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.cache import CacheFile, HashKey
+from core.ibl import GAMMA, IBL_CACHE_VERSION, IRRADIANCE_SIZE, PREFILTERED_LEVELS, PREFILTERED_SIZE, SkyLighting
+from core.texture import ContentHash
+
+FACES = ("right", "left", "top", "bottom", "front", "back")
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob("assets/skyboxes/*/"))
+
+    print("%d cores" % os.cpu_count())
+    for path in paths:
+        extension = listdir(path)[0].split(".")[-1]
+        faces = [join(path, face + "." + extension) for face in FACES]
+
+        # the same entry SkyLighting reads, removed so the first pass convolves
+        key = HashKey(*[ContentHash(face) for face in faces], IRRADIANCE_SIZE, PREFILTERED_SIZE, PREFILTERED_LEVELS, GAMMA, IBL_CACHE_VERSION)
+        cacheFile = CacheFile("ibl", dirname(faces[0]), key)
+        if os.path.exists(cacheFile):
+            os.remove(cacheFile)
+
+        start = time.perf_counter()
+        SkyLighting(faces)
+        coldTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        arrays, meta = SkyLighting(faces)
+        warmTime = time.perf_counter() - start
+
+        size = sum(array.nbytes for array in arrays.values())
+        print("  %-26s cold %7.3f s, warm %7.4f s (%.2f MB, %d levels)" % (path, coldTime, warmTime, size / 2**20, meta["levels"]))
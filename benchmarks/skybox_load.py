@@ -0,0 +1,55 @@
+""" Decode and upload time of the stock skyboxes, decoding the faces one
+after another against decoding them on the texture worker threads, at full
+resolution and downscaled.
+
+The decode columns time PIL only (no texture cache), the Skybox columns
+are the loadReport of a synchronous Skybox on a hidden GL window, with
+the texture cache warm after the first run.
+
+Usage: python benchmarks/skybox_load.py [max size]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from os import listdir
+from os.path import dirname, abspath, join
+
+import pygame as pg
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core import Skybox
+from core.texture import IMAGE_WORKERS, DecodeImage
+
+FACES = ("right", "left", "top", "bottom", "front", "back")
+
+if __name__ == "__main__":
+    maxSize = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+
+    pg.init()
+    pg.display.set_mode((64, 64), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    print("%d decode threads" % IMAGE_WORKERS)
+    with ThreadPoolExecutor(IMAGE_WORKERS) as pool:
+        for path in sorted(glob("assets/skyboxes/*/")):
+            extension = listdir(path)[0].split(".")[-1]
+            faces = [join(path, face + "." + extension) for face in FACES]
+            print(path)
+
+            for size in [0, maxSize]:
+                start = time.perf_counter()
+                for face in faces:
+                    DecodeImage(face, False, False, size)
+                serialTime = time.perf_counter() - start
+
+                start = time.perf_counter()
+                list(pool.map(lambda face: DecodeImage(face, False, False, size), faces))
+                parallelTime = time.perf_counter() - start
+
+                skybox = Skybox(faces, maxSize=size)
+                print("  %-9s decode serial %.3f s, parallel %.3f s (%.1fx) | Skybox: %s"
+                      % (size or "full size", serialTime, parallelTime, serialTime / parallelTime, skybox.loadReport()))
+                skybox.delete()
+
+    pg.quit()
@@ -0,0 +1,82 @@
+""" Compare the per-texel heightmap loader with the vectorized one.
+
+Usage: python benchmarks/terrain_load.py [heightmap.png ...]
+"""
+import sys
+import time
+from os.path import dirname, abspath
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.terrain import HeightsFromFile, VerticesFromHeights
+
+YSCALE = 64.0 / 256.0
+YSHIFT = 10.0
+REZ = 1
+
+def legacyLoad(path: str) -> tuple[np.ndarray, np.ndarray]:
+    # the original HeightMapTerrain.__loadHeightMap, minus the GL upload
+    vertices = []
+    indices = []
+
+    with Image.open(path) as img:
+        height = img.height
+        width = img.width
+
+        for i in range(height):
+            for j in range(width):
+                texel = img.getpixel((j,i))
+                if img.mode in ["RGB", "RGBA"]:
+                    y = texel[0]
+                else:
+                    message = "HeightMapTerrain does not support '" + img.mode + "' type!"
+                    raise ValueError(message)
+
+                vx = -height/2.0 + i
+                vy = y * YSCALE - YSHIFT
+                vz = -width/2.0 + j
+
+                vertices.extend([vx,vy,vz])
+
+    for i in range(0, height-1, REZ):
+        for j in range(0, width, REZ):
+            for k in range(2):
+                indices.append(j + width * (i + k*REZ))
+
+    return np.array(vertices, dtype=np.float32), np.array(indices, dtype=np.uint32)
+
+def vectorizedLoad(path: str) -> tuple[np.ndarray, np.ndarray]:
+    heights = HeightsFromFile(path)
+    height, width = heights.shape
+
+    vertices = VerticesFromHeights(heights, YSCALE, YSHIFT).reshape(-1)
+
+    # strip i alternates between rows i and i+REZ for every column j
+    rows = np.arange(0, height-1, REZ)
+    cols = np.arange(0, width, REZ)
+    offsets = np.array([0, REZ])
+    indices = cols[None, :, None] + width * (rows[:, None, None] + offsets[None, None, :])
+
+    return vertices, indices.astype(np.uint32).reshape(-1)
+
+def timeit(function, path: str):
+    start = time.perf_counter()
+    result = function(path)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["assets/heightmaps/heightmap2.png", "assets/heightmaps/heightmap1.png"]
+
+    for path in paths:
+        legacyTime, (legacyVertices, legacyIndices) = timeit(legacyLoad, path)
+        newTime, (newVertices, newIndices) = timeit(vectorizedLoad, path)
+
+        same = np.array_equal(legacyVertices, newVertices) and np.array_equal(legacyIndices, newIndices)
+
+        print(path)
+        print("  legacy:     %8.3f s" % legacyTime)
+        print("  vectorized: %8.3f s (%.0fx)" % (newTime, legacyTime / newTime))
+        print("  identical geometry:", same)
@@ -0,0 +1,31 @@
+""" Compare the GPU memory used by every terrain mode.
+
+Usage: python benchmarks/terrain_memory.py [heightmap.png ...]
+"""
+import sys
+from os.path import dirname, abspath
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.terrain import HeightMapTerrain, HeightsFromFile, TerrainVertices
+
+YSCALE = 64.0 / 256.0
+YSHIFT = 10.0
+
+MODES = (HeightMapTerrain.MODE_MESH, HeightMapTerrain.MODE_COMPACT, HeightMapTerrain.MODE_TEXTURE)
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["assets/heightmaps/heightmap2.png", "assets/heightmaps/heightmap1.png"]
+
+    for path in paths:
+        heights = HeightsFromFile(path)
+        print(path, "(" + str(heights.shape[1]) + "x" + str(heights.shape[0]) + ")")
+
+        # index patterns are the same in every mode, only the vertex data changes
+        sizes = {}
+        for mode in MODES:
+            vertices = TerrainVertices(heights, mode, YSCALE, YSHIFT, HeightMapTerrain.CHUNK_SIZE)
+            sizes[mode] = vertices.nbytes + (heights.nbytes if mode == HeightMapTerrain.MODE_TEXTURE else 0)
+
+        for mode in MODES:
+            print("  %-8s %8.1f MB  (%.1fx smaller than mesh)" % (mode, sizes[mode] / 2**20, sizes[HeightMapTerrain.MODE_MESH] / sizes[mode]))
@@ -0,0 +1,124 @@
+""" Stress the terrain tile pager with a synthetic 16 bit height field.
+
+Writes a raw height field (16384x16384 by default, 512 MB) to a temporary
+directory, flies a camera across it and reports how long the render thread
+spends paging per frame and how much tile data stays resident.
+
+A second pass renders a StreamingTerrain on a hidden GL window, as Sced
+does every frame (cull, selectLod, draw), with a small budget and a camera
+moving away while looking back at the tiles it has already loaded, so
+tiles are evicted while their chunks are in view.
+
+Usage: python benchmarks/terrain_streaming.py [size] [frames]
+"""
+import os
+import sys
+import tempfile
+import time
+from os.path import dirname, abspath
+
+import numpy as np
+import glm
+import pygame as pg
+
+from OpenGL.GL import *
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.frustum import Frustum
+from core.shader import ShaderProgram
+from core.streaming import HeightFieldFromFile, StreamingTerrain, TilePager
+from core.terrain import HeightMapTerrain
+
+def writeHeightField(path: str, size: int) -> None:
+    heights = np.memmap(path, dtype="<u2", mode="w+", shape=(size, size))
+    cols = np.arange(size)
+    # write in bands so the generator itself stays well under the budget
+    for row0 in range(0, size, 1024):
+        rows = np.arange(row0, min(row0 + 1024, size))[:, None]
+        band = 32768 + 16000 * np.sin(rows / 700.0) * np.cos(cols[None, :] / 900.0)
+        heights[row0:row0 + len(rows)] = band.astype(np.uint16)
+    heights.flush()
+    del heights
+
+def renderSession(path: str, size: int, frames: int) -> tuple[np.ndarray, int]:
+    pg.init()
+    pg.display.set_mode((256, 256), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    with open("shaders/heightMapTerrainCompact.vert") as vs, open("shaders/heightMapTerrain.frag") as fs:
+        program = ShaderProgram(vs.read(), fs.read())
+
+    # 15 tiles, fewer than the camera sees behind it
+    terrain = StreamingTerrain(path, budget=8 * 2**20)
+    projection = glm.perspective(glm.radians(45.0), 1.0, 0.1, float(size))
+
+    frameTimes = []
+    peakCalls = 0
+    for frame in range(frames):
+        # move away along +x, looking back at -x
+        t = frame / max(1, frames - 1)
+        camera = glm.vec3(-size/4.0 + t * size * 0.7, 80.0, 0.0)
+        view = glm.lookAt(camera, camera + glm.vec3(-1.0, -0.3, 0.0), glm.vec3(0.0, 1.0, 0.0))
+
+        start = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        program.use()
+        program.setMat4("model", glm.mat4(1.0))
+        program.setMat4("view", view)
+        program.setMat4("projection", projection)
+        terrain.cull(Frustum(projection * view))
+        terrain.selectLod(camera)
+        terrain.draw(program)
+        glFinish()
+        frameTimes.append(time.perf_counter() - start)
+
+        peakCalls = max(peakCalls, terrain.drawCalls)
+        time.sleep(1 / 240)
+
+    terrain.close()
+    pg.quit()
+    return np.array(frameTimes) * 1000, peakCalls
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 16384
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.r16")
+        start = time.perf_counter()
+        writeHeightField(path, size)
+        print("wrote %dx%d height field (%.0f MB) in %.1f s" % (size, size, os.path.getsize(path) / 2**20, time.perf_counter() - start))
+
+        heights = HeightFieldFromFile(path)
+        pager = TilePager(heights, StreamingTerrain.TILE_SIZE, HeightMapTerrain.CHUNK_SIZE, StreamingTerrain.MEMORY_BUDGET, 64.0 / 65536, 10.0)
+        print("budget: %d tiles of %.2f MB" % (pager.maxTiles, pager.tileBytes / 2**20))
+
+        frameTimes = []
+        loaded = 0
+        peak = 0
+        resident = {}
+        for frame in range(frames):
+            # fly diagonally across the whole field
+            t = frame / max(1, frames - 1)
+            camera = glm.vec3(-size/2.0 + t * size, 50.0, -size/2.0 + t * size)
+
+            start = time.perf_counter()
+            for tile in pager.request(camera):
+                resident.pop(tile, None)
+            for tile, origin, blocks, shapes, mins, maxs in pager.collect(StreamingTerrain.UPLOADS_PER_FRAME):
+                resident[tile] = blocks.nbytes
+                loaded += 1
+            frameTimes.append(time.perf_counter() - start)
+
+            peak = max(peak, sum(resident.values()))
+            time.sleep(1 / 240) # leave the worker some time, as a real frame would
+
+        pager.close()
+
+        frameTimes = np.array(frameTimes) * 1000
+        print("frames: %d, tiles loaded: %d" % (frames, loaded))
+        print("render thread paging time: mean %.3f ms, max %.3f ms" % (frameTimes.mean(), frameTimes.max()))
+        print("peak resident tile data: %.1f MB (budget %.1f MB)" % (peak / 2**20, StreamingTerrain.MEMORY_BUDGET / 2**20))
+
+        frameTimes, peakCalls = renderSession(path, size, frames)
+        print("rendered frames (8 MB budget): mean %.3f ms, max %.3f ms, up to %d draw calls" % (frameTimes.mean(), frameTimes.max(), peakCalls))
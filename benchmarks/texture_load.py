@@ -0,0 +1,105 @@
+""" Load time and VRAM of the stock textures, decoded with PIL and mipmapped
+by glGenerateMipmap (the original loaders) against the compiled texture cache.
+
+The first run compiles the textures, later runs only map and upload the
+compiled levels. The application's textures are compiled ahead of time
+with python -m core.precompile. VRAM is the size of every level the
+driver reports for the texture.
+
+Usage: python benchmarks/texture_load.py [image ...]
+"""
+import sys
+import time
+from glob import glob
+from os.path import dirname, abspath
+
+import pygame as pg
+from PIL import Image
+
+from OpenGL.GL import *
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.texture import CompiledImage, UploadImage
+
+def legacyLoad(path: str, flip: bool, mipmaps: bool) -> int:
+    # the original TextureFromFile (model textures) and Skybox.__loadCubemap (faces)
+    textureId = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureId)
+
+    with Image.open(path) as img:
+        if flip:
+            img = img.transpose(Image.FLIP_TOP_BOTTOM)
+        nrComponents = len(img.getbands())
+        format = GL_RED if nrComponents == 1 else \
+                 GL_RGB if nrComponents == 3 else \
+                 GL_RGBA
+
+        glTexImage2D(GL_TEXTURE_2D, 0, format, img.width, img.height, 0, format, GL_UNSIGNED_BYTE, img.tobytes())
+        if mipmaps:
+            glGenerateMipmap(GL_TEXTURE_2D)
+
+    return textureId
+
+def compiledLoad(path: str, flip: bool, mipmaps: bool) -> int:
+    arrays, meta = CompiledImage(path, flip, mipmaps, True)
+
+    textureId = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureId)
+    UploadImage(GL_TEXTURE_2D, arrays, meta)
+
+    return textureId
+
+def vram(textureId: int) -> int:
+    glBindTexture(GL_TEXTURE_2D, textureId)
+
+    size = 0
+    level = 0
+    while glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_WIDTH) > 0:
+        if glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED):
+            size += glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED_IMAGE_SIZE)
+        else:
+            width = glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_WIDTH)
+            height = glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_HEIGHT)
+            bits = sum(glGetTexLevelParameteriv(GL_TEXTURE_2D, level, parameter) for parameter in
+                       (GL_TEXTURE_RED_SIZE, GL_TEXTURE_GREEN_SIZE, GL_TEXTURE_BLUE_SIZE, GL_TEXTURE_ALPHA_SIZE))
+            size += width * height * bits // 8
+        level += 1
+
+    return size
+
+def measure(load, paths: list[tuple[str, bool, bool]]) -> tuple[float, int]:
+    glFinish()
+    start = time.perf_counter()
+    textureIds = [load(path, flip, mipmaps) for path, flip, mipmaps in paths]
+    glFinish()
+    elapsed = time.perf_counter() - start
+
+    size = sum(vram(textureId) for textureId in textureIds)
+    glDeleteTextures(len(textureIds), textureIds)
+    return elapsed, size
+
+if __name__ == "__main__":
+    pg.init()
+    pg.display.set_mode((64, 64), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    # model textures are flipped and mipmapped, skybox faces are neither
+    if len(sys.argv) > 1:
+        paths = [(path, True, True) for path in sys.argv[1:]]
+    else:
+        paths = [(path, True, True) for path in sorted(glob("assets/models/*/*.jpg") + glob("assets/models/*/*.png"))]
+        paths += [(path, False, False) for path in sorted(glob("assets/skyboxes/*/*.*"))]
+
+    print("%d textures" % len(paths))
+
+    legacyTime, legacySize = measure(legacyLoad, paths)
+    print("  PIL + glGenerateMipmap: %8.3f s %8.2f MB VRAM" % (legacyTime, legacySize / 2**20))
+
+    compileTime, compiledSize = measure(compiledLoad, paths)
+    print("  compiled, pass 1:       %8.3f s %8.2f MB VRAM" % (compileTime, compiledSize / 2**20))
+
+    cachedTime, cachedSize = measure(compiledLoad, paths)
+    print("  compiled, pass 2:       %8.3f s %8.2f MB VRAM (%.1fx faster, -%.0f%% VRAM)"
+          % (cachedTime, cachedSize / 2**20, legacyTime / cachedTime, 100.0 - 100.0 * cachedSize / legacySize))
+
+    pg.quit()
@@ -0,0 +1,70 @@
+""" Longest frame while a skybox is loaded in the middle of a session, with
+the synchronous uploads and with the uploads streamed through pixel buffer
+objects (QueueTextureUpload).
+
+Every frame clears, processes the queued uploads and waits for the GPU, so
+the frame time includes the driver side of the copies.
+
+Usage: python benchmarks/texture_streaming.py [skybox directory]
+"""
+import sys
+import time
+from os import listdir
+from os.path import dirname, abspath, join
+
+import pygame as pg
+
+from OpenGL.GL import *
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core import Skybox, FinishTextureUploads, ProcessTextureUploads
+
+FACES = ("right", "left", "top", "bottom", "front", "back")
+
+def frame() -> tuple[float, int]:
+    start = time.perf_counter()
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    pending = ProcessTextureUploads()
+    glFinish()
+    return time.perf_counter() - start, pending
+
+def session(faces: list[str], streamed: bool) -> tuple[float, int, float]:
+    for _ in range(10):
+        frame()
+
+    # the load happens during a frame, as the application would switch assets
+    start = time.perf_counter()
+    skybox = Skybox(faces, streamed=streamed)
+    _, pending = frame()
+    longest = time.perf_counter() - start
+
+    frames = 1
+    while pending > 0:
+        elapsed, pending = frame()
+        longest = max(longest, elapsed)
+        frames += 1
+    total = time.perf_counter() - start
+
+    skybox.delete()
+    return longest, frames, total
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "assets/skyboxes/skybox3"
+    extension = listdir(path)[0].split(".")[-1]
+    faces = [join(path, face + "." + extension) for face in FACES]
+
+    pg.init()
+    pg.display.set_mode((64, 64), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    # warm the texture cache so both sessions measure uploads, not compilation
+    Skybox(faces).delete()
+    FinishTextureUploads()
+
+    print(path)
+    for streamed in [False, True]:
+        longest, frames, total = session(faces, streamed)
+        print("  %-11s longest frame %7.1f ms, complete after %3d frames (%.3f s)"
+              % ("streamed" if streamed else "synchronous", longest * 1000.0, frames, total))
+
+    pg.quit()
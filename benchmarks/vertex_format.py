@@ -0,0 +1,87 @@
+""" Size and numeric visual diff of the packed vertex formats against float32.
+
+The packed buffers are decoded the way the GL vertex fetch does (unorm16,
+snorm 2_10_10_10, half float) and the decoded attributes are compared with
+the float ones, including the Lambert term the shaders compute from them.
+
+Usage: python benchmarks/vertex_format.py [model.obj ...]
+"""
+import sys
+from os.path import dirname, abspath
+
+import numpy as np
+
+import pyassimp
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from core.mesh import PackVertices, Vertex
+from core.meshopt import OptimizeMesh
+from core.model import ArraysFromAssimpMesh, Model
+
+TEXTURE_SIZE = 4096
+LIGHTS = np.array([[0.0, 1.0, 0.0], [0.577, 0.577, 0.577], [-0.8, 0.2, 0.57]])
+
+def unpackVertices(packed: np.ndarray, vertexFormat: str, boundsMin: np.ndarray, boundsMax: np.ndarray) -> np.ndarray:
+    records = packed.reshape(-1).view(Vertex.packedDtype(vertexFormat))
+    vertices = np.zeros((len(records), 8), dtype=np.float64)
+
+    if vertexFormat == Vertex.FORMAT_QUANTIZED:
+        extent = boundsMax - boundsMin
+        extent[extent == 0] = 1.0
+        vertices[:, 0:3] = records["position"] / 65535.0 * extent + boundsMin
+    else:
+        vertices[:, 0:3] = records["position"]
+
+    # signed normalized fixed point, GL 4.2+ rule: max(c / 511, -1)
+    normal = records["normal"].astype(np.int64)
+    for k in range(3):
+        component = (normal >> (10 * k)) & 0x3FF
+        component = np.where(component >= 512, component - 1024, component)
+        vertices[:, 3 + k] = np.maximum(component / 511.0, -1.0)
+
+    vertices[:, 6:8] = records["texCoords"]
+    return vertices
+
+def compare(vertices: np.ndarray, decoded: np.ndarray, boundsMin: np.ndarray, boundsMax: np.ndarray) -> dict:
+    diagonal = np.linalg.norm(boundsMax - boundsMin)
+
+    normals = vertices[:, 3:6] / np.maximum(np.linalg.norm(vertices[:, 3:6], axis=1, keepdims=True), 1e-12)
+    decodedNormals = decoded[:, 3:6] / np.maximum(np.linalg.norm(decoded[:, 3:6], axis=1, keepdims=True), 1e-12)
+    angles = np.degrees(np.arccos(np.clip(np.einsum("ij,ij->i", normals, decodedNormals), -1.0, 1.0)))
+
+    lambert = np.clip(normals @ LIGHTS.T, 0.0, 1.0)
+    decodedLambert = np.clip(decodedNormals @ LIGHTS.T, 0.0, 1.0)
+
+    return {
+        "position error (% of diagonal)": np.abs(decoded[:, 0:3] - vertices[:, 0:3]).max() / diagonal * 100.0,
+        "normal error (degrees)": angles.max(),
+        "uv error (texels @%d)" % TEXTURE_SIZE: np.abs(decoded[:, 6:8] - vertices[:, 6:8]).max() * TEXTURE_SIZE,
+        "lambert error (8-bit levels)": np.abs(decodedLambert - lambert).max() * 255.0,
+    }
+
+def meshes(node):
+    yield from node.meshes
+    for child in node.children:
+        yield from meshes(child)
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["assets/models/backpack/backpack.obj", "assets/models/capsule/capsule.obj"]
+
+    for path in paths:
+        with pyassimp.load(path, processing=Model.PROCESSING_FLAGS) as scene:
+            vertices = np.concatenate([OptimizeMesh(*ArraysFromAssimpMesh(mesh))[0] for mesh in meshes(scene.rootnode)])
+
+        boundsMin = vertices[:, 0:3].min(axis=0).astype(np.float64)
+        boundsMax = vertices[:, 0:3].max(axis=0).astype(np.float64)
+
+        print(path, "(%d vertices)" % len(vertices))
+        print("  %-10s %3d bytes/vertex %8.2f MB" % (Vertex.FORMAT_FLOAT, Vertex.size(), vertices.nbytes / 2**20))
+
+        for vertexFormat in [Vertex.FORMAT_PACKED, Vertex.FORMAT_QUANTIZED]:
+            packed = PackVertices(vertices, vertexFormat, boundsMin, boundsMax)
+            decoded = unpackVertices(packed, vertexFormat, boundsMin, boundsMax)
+
+            print("  %-10s %3d bytes/vertex %8.2f MB (-%.0f%%)" % (vertexFormat, packed.shape[1], packed.nbytes / 2**20, 100.0 - 100.0 * packed.nbytes / vertices.nbytes))
+            for name, value in compare(vertices.astype(np.float64), decoded, boundsMin, boundsMax).items():
+                print("    %-32s %.4f" % (name, value))
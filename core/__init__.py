@@ -1,7 +1,12 @@
 from .camera import Camera
+from .frustum import Frustum, TransformBox
+from .geometry import AcquireCube, AcquireGeometry, GeometryStats, ReleaseGeometry
+from .ibl import SkyLighting
 from .light import LightManager
-from .mesh import Mesh
-from .model import Model
+from .mesh import Vertex
+from .model import Model, ScreenSize
 from .shader import ShaderProgram
 from .skybox import Skybox
-from .terrain import HeightMapTerrain
\ No newline at end of file
+from .streaming import StreamingTerrain
+from .terrain import HeightMapTerrain
+from .texture import AcquireTexture, FinishTextureUploads, LoadTextureImages, ProcessTextureUploads, QueueTextureUpload, ReleaseTexture, TextureLoadTimes, TextureStats
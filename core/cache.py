@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+# directory of the build caches, relative to the working directory
+CACHE_DIR = ".cache"
+
+MAGIC = b"SCED"
+ALIGNMENT = 64
+
+def HashFile(path: str) -> str:
+    """Hex digest of the contents of a file.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def HashKey(*parts) -> str:
+    """Hex digest of a sequence of values (hashes, build parameters, ...).
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def CacheFile(kind: str, source: str, key: str) -> str:
+    """Path of the cache file of a source asset.
+
+    Args:
+        kind (str): Cache category (terrains, models, ...).
+        source (str): Path of the source asset.
+        key (str): Hash of the asset contents and build parameters.
+    """
+    name = source.replace("\\", "/").strip("./").replace("/", "_")
+    return os.path.join(CACHE_DIR, kind, name + "-" + key[:16] + ".bin")
+
+def ReadCache(path: str) -> tuple[dict, dict]:
+    """Memory-map the arrays of a cache file.
+
+    Returns:
+        tuple: dict of read-only np.memmap arrays and the metadata dict,
+            or None when the file does not exist or is not a cache file.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as file:
+        if file.read(4) != MAGIC:
+            return None
+        headerSize, = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(headerSize))
+
+    arrays = {}
+    for name, info in header["arrays"].items():
+        shape = tuple(info["shape"])
+        if np.prod(shape) == 0:
+            arrays[name] = np.empty(shape, dtype=info["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=info["dtype"], mode="r", offset=info["offset"], shape=shape)
+
+    return arrays, header["meta"]
+
+def CachedBuild(path: str, build) -> tuple[dict, dict]:
+    """Arrays of a cache file, built and written first when missing.
+
+    The freshly built arrays are mapped back from the written file, so
+    callers only ever hold file-backed pages that the OS can drop, even on
+    a cold start. When the file cannot be written the built arrays are
+    returned as they are.
+
+    Args:
+        path (str): Cache file path, see CacheFile.
+        build: Called without arguments on a miss, returns (arrays, meta).
+
+    Returns:
+        tuple: dict of arrays and the metadata dict.
+    """
+    cached = ReadCache(path)
+    if cached is None:
+        built = build()
+        WriteCache(path, *built)
+        cached = ReadCache(path) or built
+
+    return cached
+
+def WriteCache(path: str, arrays: dict, meta: dict) -> None:
+    """Store arrays and metadata in a memory-mappable cache file.
+
+    Older cache files of the same source (same name, other key) are
+    removed. Failures are reported but never fatal.
+
+    Args:
+        path (str): Cache file path, see CacheFile.
+        arrays (dict): Named numpy arrays.
+        meta (dict): JSON serializable metadata.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # lay the arrays out after the header, every one aligned for direct mapping
+        layout = {}
+        headerSize = 4096
+        while True:
+            offset = _align(8 + headerSize)
+            for name, array in arrays.items():
+                layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+                offset = _align(offset + array.nbytes)
+            header = json.dumps({"meta": meta, "arrays": layout}).encode()
+            if len(header) <= headerSize:
+                break
+            headerSize = _align(len(header))
+
+        # a name of its own, worker threads may build the same entry at once (the last replace wins)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False) as file:
+            temporary = file.name
+            try:
+                file.write(MAGIC)
+                file.write(struct.pack("<I", headerSize))
+                file.write(header.ljust(headerSize))
+                for name, array in arrays.items():
+                    file.seek(layout[name]["offset"])
+                    file.write(np.ascontiguousarray(array).tobytes())
+            except OSError:
+                file.close()
+                os.remove(temporary)
+                raise
+        os.replace(temporary, path)
+
+        # older entries of the same source, not the files other threads are still writing
+        prefix = os.path.basename(path).rsplit("-", 1)[0] + "-"
+        for f in os.listdir(os.path.dirname(path)):
+            if f.startswith(prefix) and "-" not in f[len(prefix):] and not f.endswith(".tmp") and f != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(os.path.dirname(path), f))
+                except FileNotFoundError:
+                    pass # removed by another writer
+
+    except OSError as e:
+        print("Could not write cache file '" + path + "':", e, file=sys.stderr)
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
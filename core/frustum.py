@@ -0,0 +1,110 @@
+import numpy as np
+
+import glm
+
+class Frustum:
+    OUTSIDE = 0
+    INTERSECT = 1
+    INSIDE = 2
+
+    def __init__(self, matrix: glm.mat4):
+        """View frustum in world space.
+
+        Args:
+            matrix (glm.mat4): Combined projection * view matrix.
+        """
+        rows = np.array(matrix, dtype=np.float64)
+
+        # left, right, bottom, top, near, far (Gribb & Hartmann)
+        planes = np.array([
+            rows[3] + rows[0],
+            rows[3] - rows[0],
+            rows[3] + rows[1],
+            rows[3] - rows[1],
+            rows[3] + rows[2],
+            rows[3] - rows[2],
+        ])
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+        self.planes = planes
+        self.__planeList = planes.tolist()
+
+    def testBox(self, boxMin, boxMax) -> int:
+        """Classify an axis aligned box against the frustum.
+
+        Args:
+            boxMin: Minimum corner (x,y,z).
+            boxMax: Maximum corner (x,y,z).
+
+        Returns:
+            int: Frustum.OUTSIDE, Frustum.INTERSECT or Frustum.INSIDE.
+        """
+        result = Frustum.INSIDE
+        for a, b, c, d in self.__planeList:
+            # corner furthest along the plane normal (p-vertex) and the opposite one (n-vertex)
+            px = boxMax[0] if a >= 0 else boxMin[0]
+            py = boxMax[1] if b >= 0 else boxMin[1]
+            pz = boxMax[2] if c >= 0 else boxMin[2]
+            if a*px + b*py + c*pz + d < 0:
+                return Frustum.OUTSIDE
+
+            nx = boxMin[0] if a >= 0 else boxMax[0]
+            ny = boxMin[1] if b >= 0 else boxMax[1]
+            nz = boxMin[2] if c >= 0 else boxMax[2]
+            if a*nx + b*ny + c*nz + d < 0:
+                result = Frustum.INTERSECT
+
+        return result
+
+    def testBoxes(self, boxMins: np.ndarray, boxMaxs: np.ndarray) -> np.ndarray:
+        """Vectorized visibility test of many axis aligned boxes.
+
+        Args:
+            boxMins (np.ndarray): (n,3) minimum corners.
+            boxMaxs (np.ndarray): (n,3) maximum corners.
+
+        Returns:
+            np.ndarray: (n,) boolean mask of the boxes that are not outside.
+        """
+        normals = self.planes[:, :3]
+        pVertices = np.where(normals[None, :, :] >= 0, boxMaxs[:, None, :], boxMins[:, None, :])
+        distances = np.einsum("npk,pk->np", pVertices, normals) + self.planes[None, :, 3]
+        return np.all(distances >= 0, axis=1)
+
+def Bounds(positions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """Bounding box and bounding sphere (around the box center) of points.
+
+    Returns:
+        tuple: Minimum corner, maximum corner, sphere center and radius,
+            all zero for no points.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return np.zeros(3), np.zeros(3), np.zeros(3), 0.0
+
+    boxMin = positions.min(axis=0)
+    boxMax = positions.max(axis=0)
+    center = (boxMin + boxMax) / 2
+    radius = float(np.linalg.norm(positions - center, axis=1).max())
+
+    return boxMin, boxMax, center, radius
+
+def TransformBox(boxMin, boxMax, matrix: glm.mat4) -> tuple[np.ndarray, np.ndarray]:
+    """Axis aligned box enclosing a transformed box (Arvo's center/extent form).
+
+    Args:
+        boxMin: Minimum corner (x,y,z).
+        boxMax: Maximum corner (x,y,z).
+        matrix (glm.mat4): Affine transform.
+
+    Returns:
+        tuple: Minimum and maximum corners of the transformed box.
+    """
+    rows = np.array(matrix, dtype=np.float64)
+    center = (np.asarray(boxMin, dtype=np.float64) + boxMax) / 2
+    extent = (np.asarray(boxMax, dtype=np.float64) - boxMin) / 2
+
+    center = rows[:3, :3] @ center + rows[:3, 3]
+    extent = np.abs(rows[:3, :3]) @ extent
+
+    return center - extent, center + extent
@@ -0,0 +1,139 @@
+import hashlib
+
+import numpy as np
+
+from OpenGL.GL import *
+import glm
+
+# 36 positions of a unit (-1..1) cube drawn as a plain triangle list, used by skyboxes and light gizmos
+CUBE_VERTICES = np.array([
+    -1.0,  1.0, -1.0,
+    -1.0, -1.0, -1.0,
+    1.0, -1.0, -1.0,
+    1.0, -1.0, -1.0,
+    1.0,  1.0, -1.0,
+    -1.0,  1.0, -1.0,
+
+    -1.0, -1.0,  1.0,
+    -1.0, -1.0, -1.0,
+    -1.0,  1.0, -1.0,
+    -1.0,  1.0, -1.0,
+    -1.0,  1.0,  1.0,
+    -1.0, -1.0,  1.0,
+
+    1.0, -1.0, -1.0,
+    1.0, -1.0,  1.0,
+    1.0,  1.0,  1.0,
+    1.0,  1.0,  1.0,
+    1.0,  1.0, -1.0,
+    1.0, -1.0, -1.0,
+
+    -1.0, -1.0,  1.0,
+    -1.0,  1.0,  1.0,
+    1.0,  1.0,  1.0,
+    1.0,  1.0,  1.0,
+    1.0, -1.0,  1.0,
+    -1.0, -1.0,  1.0,
+
+    -1.0,  1.0, -1.0,
+    1.0,  1.0, -1.0,
+    1.0,  1.0,  1.0,
+    1.0,  1.0,  1.0,
+    -1.0,  1.0,  1.0,
+    -1.0,  1.0, -1.0,
+
+    -1.0, -1.0, -1.0,
+    -1.0, -1.0,  1.0,
+    1.0, -1.0, -1.0,
+    1.0, -1.0, -1.0,
+    -1.0, -1.0,  1.0,
+    1.0, -1.0,  1.0
+], dtype=np.float32)
+
+# content key -> [(VAO, VBO, EBO), references], shared by every asset of the process
+_geometries = {}
+# VAO -> content key
+_keys = {}
+
+def AcquireGeometry(layout: str, vertices: np.ndarray, indices: np.ndarray, uploader, key: str = None) -> tuple[int, int, int]:
+    """GPU buffers of vertex (and index) data, shared by everything that
+    uploads the same bytes with the same layout.
+
+    Args:
+        layout (str): Vertex layout name, part of the key (Vertex.FORMAT_*, "position", ...).
+        vertices (np.ndarray): Vertex data.
+        indices (np.ndarray): Index data, or None for non indexed geometry.
+        uploader: Called without arguments on a miss, returns (VAO, VBO, EBO).
+        key (str): Identity of the data the caller already has (a cache
+            key), so the bytes need not be read. None hashes them, for
+            uncached and procedural geometry.
+
+    Returns:
+        tuple: VAO, VBO and EBO ids (EBO 0 without indices), to be given
+            back with ReleaseGeometry.
+    """
+    if key is None:
+        digest = hashlib.sha1(np.ascontiguousarray(vertices).view(np.uint8).reshape(-1))
+        digest.update(str(np.asarray(vertices).dtype).encode())
+        if indices is not None:
+            digest.update(np.ascontiguousarray(indices).view(np.uint8).reshape(-1))
+            digest.update(str(np.asarray(indices).dtype).encode())
+        key = "content." + digest.hexdigest()
+    key = (layout, key)
+
+    entry = _geometries.get(key)
+    if entry is None:
+        entry = [tuple(uploader()), 0]
+        _geometries[key] = entry
+        _keys[entry[0][0]] = key
+
+    entry[1] += 1
+    return entry[0]
+
+def ReleaseGeometry(VAO: int) -> None:
+    """Drop a reference taken by AcquireGeometry, deleting the buffers with
+    the last one.
+    """
+    key = _keys.get(VAO)
+    if key is None:
+        return
+
+    entry = _geometries[key]
+    entry[1] -= 1
+    if entry[1] == 0:
+        VAO, VBO, EBO = entry[0]
+        glDeleteVertexArrays(1, [VAO])
+        glDeleteBuffers(2 if EBO else 1, [VBO, EBO] if EBO else [VBO])
+        del _geometries[key]
+        del _keys[VAO]
+
+def GeometryStats() -> tuple[int, int]:
+    """Number of shared geometries and of references to them.
+    """
+    return len(_geometries), sum(references for _, references in _geometries.values())
+
+def AcquireCube() -> tuple[int, int, int]:
+    """Shared CUBE_VERTICES geometry, positions at attribute 0.
+    """
+    return AcquireGeometry("position", CUBE_VERTICES, None, lambda: PositionArrayFromBuffer(CUBE_VERTICES))
+
+def PositionArrayFromBuffer(vertices: np.ndarray) -> tuple[int, int, int]:
+    """Upload tightly packed float32 positions.
+
+    Returns:
+        tuple: VAO, VBO and 0 (no index buffer).
+    """
+    VAO = glGenVertexArrays(1)
+    VBO = glGenBuffers(1)
+
+    glBindVertexArray(VAO)
+    glBindBuffer(GL_ARRAY_BUFFER, VBO)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+
+    # vertex position
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * glm.sizeof(glm.float32), None)
+
+    glBindVertexArray(0)
+
+    return VAO, VBO, 0
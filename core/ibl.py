@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from PIL import Image
+
+from .cache import CacheFile, CachedBuild, HashKey
+from .texture import ContentHash, DecodeImage
+
+IBL_CACHE_VERSION = 1 # bump when the maps or their layout change
+IRRADIANCE_SIZE = 32
+PREFILTERED_SIZE = 128
+PREFILTERED_LEVELS = 5 # roughness level / (levels - 1) per mip level
+GAMMA = 2.2 # skybox images are display encoded, the convolutions run on linear radiance
+CHUNK = 256 # output texels convolved at once, bounds the (chunk, source texels) temporaries
+
+_builder = None
+
+def SkyLighting(faces: list[str]) -> tuple[dict, dict]:
+    """Irradiance and pre-filtered specular cubemaps of a skybox, computed
+    on the first use and then memory-mapped from the cache.
+
+    Args:
+        faces (list[str]): Images of the +X, -X, +Y, -Y, +Z and -Z faces.
+
+    Returns:
+        tuple: "irradiance" and "prefiltered0", "prefiltered1", ... float16
+            (6, size, size, 3) arrays, display encoded like the skybox, and
+            the metadata (sizes and levels).
+    """
+    key = HashKey(*[ContentHash(face) for face in faces], IRRADIANCE_SIZE, PREFILTERED_SIZE, PREFILTERED_LEVELS, GAMMA, IBL_CACHE_VERSION)
+    cacheFile = CacheFile("ibl", os.path.dirname(faces[0]), key)
+    return CachedBuild(cacheFile, lambda: ComputeSkyLighting(faces))
+
+def QueueSkyLighting(faces: list[str]) -> Future:
+    """SkyLighting on a background thread, one skybox at a time (each build
+    already takes every core), so the caller can go on without the maps.
+
+    Returns:
+        Future: The SkyLighting result.
+    """
+    global _builder
+    if _builder is None:
+        _builder = ThreadPoolExecutor(1, thread_name_prefix="ibl")
+    return _builder.submit(SkyLighting, faces)
+
+def ComputeSkyLighting(faces: list[str]) -> tuple[dict, dict]:
+    """Convolve a skybox on every CPU core, see SkyLighting.
+    """
+    # spawned, not forked: the parent holds a GL context and busy decode threads whose locks a fork would copy
+    with ProcessPoolExecutor(os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as pool:
+        # decoded without the texture cache, the maps are the only thing kept
+        images = []
+        for levels, meta in pool.map(DecodeImage, faces, [False] * len(faces), [False] * len(faces)):
+            images.append(levels[0].reshape(meta["height"], meta["width"], meta["components"]))
+
+        # roughness 0 is the sky itself, the rougher levels and the irradiance are a convolution per face
+        arrays = {"prefiltered0": ResampleCube(images, PREFILTERED_SIZE)}
+        tasks = {"irradiance": (ResampleCube(images, IRRADIANCE_SIZE), IRRADIANCE_SIZE, None)}
+        for level in range(1, PREFILTERED_LEVELS):
+            size = max(PREFILTERED_SIZE >> level, 1)
+            tasks["prefiltered" + str(level)] = (ResampleCube(images, size), size, level / (PREFILTERED_LEVELS - 1))
+
+        futures = {name: [pool.submit(ConvolveFace, source, face, size, roughness) for face in range(6)] for name, (source, size, roughness) in tasks.items()}
+        for name, faceFutures in futures.items():
+            arrays[name] = np.stack([future.result() for future in faceFutures])
+
+    arrays = {name: np.power(np.clip(cube, 0.0, None), 1.0 / GAMMA).astype(np.float16) for name, cube in arrays.items()}
+    meta = {"irradianceSize": IRRADIANCE_SIZE, "prefilteredSize": PREFILTERED_SIZE, "levels": PREFILTERED_LEVELS}
+
+    return arrays, meta
+
+def ResampleCube(images: list[np.ndarray], size: int) -> np.ndarray:
+    """Box filter six face images down to size, in linear radiance.
+
+    Returns:
+        np.ndarray: (6, size, size, 3) float32.
+    """
+    cube = np.zeros((6, size, size, 3), dtype=np.float32)
+    for face, image in enumerate(images):
+        image = image[:, :, :3] if image.shape[2] >= 3 else np.repeat(image[:, :, :1], 3, axis=2)
+
+        # PIL brings large faces down to 4x the size, the last box filter averages linear radiance
+        if image.shape[0] > size * 4 or image.shape[1] > size * 4:
+            image = np.asarray(Image.fromarray(np.ascontiguousarray(image)).resize((size * 4, size * 4), Image.BOX))
+        linear = np.power(image.astype(np.float32) / 255.0, GAMMA)
+
+        height, width = linear.shape[:2]
+        if height % size == 0 and width % size == 0:
+            cube[face] = linear.reshape(size, height // size, size, width // size, 3).mean(axis=(1, 3))
+        else:
+            cube[face] = np.stack([np.asarray(Image.fromarray(np.ascontiguousarray(linear[:, :, k])).resize((size, size), Image.BOX)) for k in range(3)], axis=2)
+
+    return cube
+
+def CubeDirections(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Unit direction and solid angle of every texel of a cubemap, faces in
+    GL order with rows top to bottom as they are uploaded.
+
+    Returns:
+        tuple: (6, size, size, 3) directions and (6, size, size) solid angles.
+    """
+    coords = (np.arange(size, dtype=np.float64) + 0.5) / size * 2.0 - 1.0
+    t, s = np.meshgrid(coords, coords, indexing="ij")
+    one = np.ones_like(s)
+
+    # GL spec cube map face selection, inverted
+    directions = np.stack([
+        np.stack([one, -t, -s], axis=-1),
+        np.stack([-one, -t, s], axis=-1),
+        np.stack([s, one, t], axis=-1),
+        np.stack([s, -one, -t], axis=-1),
+        np.stack([s, -t, one], axis=-1),
+        np.stack([-s, -t, -one], axis=-1),
+    ])
+    lengths = np.linalg.norm(directions, axis=-1)
+
+    # a texel of side 2 / size on the unit cube seen from its center
+    solidAngles = (2.0 / size) ** 2 / lengths ** 3
+
+    return directions / lengths[..., None], solidAngles
+
+def ConvolveFace(source: np.ndarray, face: int, size: int, roughness: float = None) -> np.ndarray:
+    """Convolve a linear radiance cubemap for the texels of one output face.
+
+    With roughness None this is the diffuse irradiance (cosine lobe, divided
+    by pi), otherwise the GGX lobe of that roughness around the direction,
+    with the view along the normal as in the split sum approximation.
+
+    Args:
+        source (np.ndarray): (6, n, n, 3) linear radiance.
+        face (int): Output face, 0 to 5.
+        size (int): Output face size.
+        roughness (float): Perceptual roughness, 0 to 1.
+
+    Returns:
+        np.ndarray: (size, size, 3) float32.
+    """
+    sourceDirections, solidAngles = CubeDirections(source.shape[1])
+    sourceDirections = sourceDirections.reshape(-1, 3).astype(np.float32)
+    solidAngles = solidAngles.reshape(-1).astype(np.float32)
+    radiance = source.reshape(-1, 3)
+
+    directions = CubeDirections(size)[0][face].reshape(-1, 3).astype(np.float32)
+    alpha2 = np.float32((roughness or 0.0) ** 4)
+
+    result = np.zeros((len(directions), 3), dtype=np.float32)
+    for start in range(0, len(directions), CHUNK):
+        cosines = directions[start:start+CHUNK] @ sourceDirections.T
+        np.maximum(cosines, 0.0, out=cosines)
+
+        if roughness is None:
+            weights = cosines * solidAngles
+            result[start:start+CHUNK] = weights @ radiance / np.float32(np.pi)
+        else:
+            # cos^2 of the half vector angle is (1 + cos) / 2, GGX D without the constant factors
+            halfCosines = (1.0 + cosines) * 0.5
+            denominators = halfCosines * (alpha2 - 1.0) + 1.0
+            weights = np.where(cosines > 0.0, cosines * solidAngles / (denominators * denominators), 0.0).astype(np.float32)
+            result[start:start+CHUNK] = weights @ radiance / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+
+    return result.reshape(size, size, 3)
@@ -1,8 +1,7 @@
-import numpy as np
-
 from OpenGL.GL import *
 import glm
 
+from .geometry import AcquireCube
 from .shader import ShaderProgram
 from .camera import Camera
 
@@ -243,56 +242,5 @@ class LightManager:
                 break
     
     def __loadPointLightGeometry(self):
-        data = glm.array(np.array([
-            -1.0,  1.0, -1.0,
-            -1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            1.0,  1.0, -1.0,
-            -1.0,  1.0, -1.0,
-
-            -1.0, -1.0,  1.0,
-            -1.0, -1.0, -1.0,
-            -1.0,  1.0, -1.0,
-            -1.0,  1.0, -1.0,
-            -1.0,  1.0,  1.0,
-            -1.0, -1.0,  1.0,
-
-            1.0, -1.0, -1.0,
-            1.0, -1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0, -1.0,
-            1.0, -1.0, -1.0,
-
-            -1.0, -1.0,  1.0,
-            -1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0, -1.0,  1.0,
-            -1.0, -1.0,  1.0,
-
-            -1.0,  1.0, -1.0,
-            1.0,  1.0, -1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            -1.0,  1.0,  1.0,
-            -1.0,  1.0, -1.0,
-
-            -1.0, -1.0, -1.0,
-            -1.0, -1.0,  1.0,
-            1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            -1.0, -1.0,  1.0,
-            1.0, -1.0,  1.0
-        ], dtype=np.float32))
-        
-        self.pointLightVAO = glGenVertexArrays(1)
-        self.pointLightVBO = glGenBuffers(1)
-
-        glBindVertexArray(self.pointLightVAO)
-        glBindBuffer(GL_ARRAY_BUFFER, self.pointLightVBO)
-        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data.ptr, GL_STATIC_DRAW)
-        
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * glm.sizeof(glm.float32), None)
-        glEnableVertexAttribArray(0)
\ No newline at end of file
+        # same cube as the skyboxes, uploaded once
+        self.pointLightVAO, self.pointLightVBO, _ = AcquireCube()
\ No newline at end of file
@@ -12,6 +12,13 @@ class Vertex:
     position: glm.vec3
     normal: glm.vec3
     texCoords: glm.vec2
+
+    # GPU layouts: float32 everywhere (32 bytes), 2_10_10_10 normals and half
+    # float texture coordinates (20 bytes), plus unorm16 positions against the
+    # mesh bounds (16 bytes)
+    FORMAT_FLOAT = "float"
+    FORMAT_PACKED = "packed"
+    FORMAT_QUANTIZED = "quantized"
     
     @property
     def array(self) -> glm.array:
@@ -36,40 +43,53 @@ class Vertex:
     @staticmethod
     def size() -> int:
         return Vertex.texCoordsOffset().value + glm.sizeof(glm.vec2) 
+
+    @staticmethod
+    def packedDtype(vertexFormat: str) -> np.dtype:
+        """Record type of a vertex in one of the packed formats.
+        """
+        if vertexFormat == Vertex.FORMAT_PACKED:
+            return np.dtype([("position", "<f4", 3), ("normal", "<u4"), ("texCoords", "<f2", 2)])
+        elif vertexFormat == Vertex.FORMAT_QUANTIZED:
+            return np.dtype([("position", "<u2", 3), ("padding", "<u2"), ("normal", "<u4"), ("texCoords", "<f2", 2)])
+
+        message = "Vertex format '" + vertexFormat + "' is not a packed format!"
+        raise ValueError(message)
     
+# material texture types, in the order of the texture array units and of the materialLayers uniform
+MATERIAL_SLOTS = ("texture_diffuse", "texture_specular", "texture_normal", "texture_height")
+
 @dataclass
 class Texture:
     id: int
     type: str
     path: str
     
-class Mesh:
-    def __init__(self, vertices: list[Vertex], indices: list[int], textures: list[Texture]):
-        self.vertices = []
-        for v in vertices:
-            self.vertices.extend(v.array.to_list())
-
-        self.vertices = glm.array(np.array(self.vertices, dtype=np.float32))
-
-        self.indices = glm.array.from_numbers(glm.uint32, *indices)
+def VertexArrayFromBuffers(vertices: np.ndarray, indices: np.ndarray, vertexFormat: str = Vertex.FORMAT_FLOAT) -> tuple[int, int, int]:
+    """Upload Vertex laid out vertices and uint16 or uint32 indices.
 
-        self.textures = textures
+    Args:
+        vertices (np.ndarray): (n, 8) float32 vertices, or the packed
+            vertices of PackVertices for the other formats.
+        indices (np.ndarray): uint16 or uint32 indices.
+        vertexFormat (str): One of the Vertex.FORMAT_* layouts.
 
-        self.__setupMesh()
-    
-    def __setupMesh(self) -> None:
-        self.VAO = glGenVertexArrays(1)
-        self.VBO = glGenBuffers(1)
-        self.EBO = glGenBuffers(1)
+    Returns:
+        tuple: VAO, VBO and EBO ids.
+    """
+    VAO = glGenVertexArrays(1)
+    VBO = glGenBuffers(1)
+    EBO = glGenBuffers(1)
 
-        glBindVertexArray(self.VAO)
+    glBindVertexArray(VAO)
 
-        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices.ptr, GL_STATIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, VBO)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
 
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices.ptr, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, EBO)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
 
+    if vertexFormat == Vertex.FORMAT_FLOAT:
         # vertex position
         glEnableVertexAttribArray(0)	
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, Vertex.size(), None)
@@ -81,40 +101,115 @@ class Mesh:
         # vertex texture coords
         glEnableVertexAttribArray(2)	
         glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, Vertex.size(), Vertex.texCoordsOffset())
+
+    else:
+        dtype = Vertex.packedDtype(vertexFormat)
+
+        # quantized positions read as [0,1] per axis, the model matrix maps them back onto the bounds
+        glEnableVertexAttribArray(0)
+        if vertexFormat == Vertex.FORMAT_QUANTIZED:
+            glVertexAttribPointer(0, 3, GL_UNSIGNED_SHORT, GL_TRUE, dtype.itemsize, None)
+        else:
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, dtype.itemsize, None)
+
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 4, GL_INT_2_10_10_10_REV, GL_TRUE, dtype.itemsize, ctypes.c_void_p(dtype.fields["normal"][1]))
+
+        glEnableVertexAttribArray(2)
+        glVertexAttribPointer(2, 2, GL_HALF_FLOAT, GL_FALSE, dtype.itemsize, ctypes.c_void_p(dtype.fields["texCoords"][1]))
+    
+    glBindVertexArray(0)
+
+    return VAO, VBO, EBO
+
+def IndexArray(indices: np.ndarray, numVertices: int) -> np.ndarray:
+    """Contiguous index array, uint16 when every vertex is addressable with
+    16 bits (half the memory and fetch bandwidth), uint32 otherwise.
+    """
+    dtype = np.uint16 if numVertices <= 2**16 else np.uint32
+    return np.ascontiguousarray(indices, dtype=dtype)
+
+def IndexType(indices: np.ndarray) -> int:
+    """GL index type matching an index array.
+    """
+    return GL_UNSIGNED_SHORT if indices.dtype == np.uint16 else GL_UNSIGNED_INT
+
+def PackVertices(vertices: np.ndarray, vertexFormat: str, boundsMin: np.ndarray, boundsMax: np.ndarray) -> np.ndarray:
+    """Convert float vertices to one of the packed formats.
+
+    Args:
+        vertices (np.ndarray): (n, 8) float32 vertices laid out as Vertex.
+        vertexFormat (str): Vertex.FORMAT_PACKED or Vertex.FORMAT_QUANTIZED.
+        boundsMin (np.ndarray): Minimum corner the positions are quantized against.
+        boundsMax (np.ndarray): Maximum corner.
+
+    Returns:
+        np.ndarray: (n, stride) uint8 vertex records.
+    """
+    dtype = Vertex.packedDtype(vertexFormat)
+    packed = np.zeros(len(vertices), dtype=dtype)
+
+    if vertexFormat == Vertex.FORMAT_QUANTIZED:
+        boundsMin = np.asarray(boundsMin, dtype=np.float64)
+        extent = np.asarray(boundsMax, dtype=np.float64) - boundsMin
+        extent[extent == 0] = 1.0
+        packed["position"] = np.rint((vertices[:, 0:3] - boundsMin) / extent * 65535.0).clip(0, 65535)
+    else:
+        packed["position"] = vertices[:, 0:3]
+
+    packed["normal"] = PackNormals(vertices[:, 3:6])
+    packed["texCoords"] = vertices[:, 6:8]
+
+    return packed.view(np.uint8).reshape(len(vertices), dtype.itemsize)
+
+def PackNormals(normals: np.ndarray) -> np.ndarray:
+    """Signed normalized GL_INT_2_10_10_10_REV encoding of (n, 3) normals.
+    """
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    lengths[lengths == 0] = 1.0
+    components = np.rint(np.clip(normals / lengths, -1.0, 1.0) * 511.0).astype(np.int32) & 0x3FF
+    return (components[:, 0] | (components[:, 1] << 10) | (components[:, 2] << 20)).astype(np.uint32)
+
+def BindTextures(shaderProgram: ShaderProgram, textures: list[Texture]) -> None:
+    """Bind material textures to consecutive units and point the samplers
+    (texture_diffuse1, texture_specular1, ...) at them.
+    """
+    # bind appropriate textures
+    diffuseNr  = 1
+    specularNr = 1
+    normalNr   = 1
+    heightNr   = 1
+
+    for i in range(len(textures)):
+        glActiveTexture(GL_TEXTURE0 + i)
+
+        number = None
+        name = textures[i].type
         
-        glBindVertexArray(0)
-
-    def draw(self, shaderProgram: ShaderProgram) -> None:
-        # bind appropriate textures
-        diffuseNr  = 1
-        specularNr = 1
-        normalNr   = 1
-        heightNr   = 1
-
-        for i in range(len(self.textures)):
-            glActiveTexture(GL_TEXTURE0 + i)
-
-            number = None
-            name = self.textures[i].type
-            
-            if name == "texture_diffuse":
-                number = str(diffuseNr)
-                diffuseNr += 1
-            elif name == "texture_specular":
-                number = str(specularNr)
-                specularNr += 1
-            elif(name == "texture_normal"):
-                number = str(normalNr)
-                normalNr += 1
-            elif(name == "texture_height"):
-                number = str(heightNr)
-                heightNr += 1
-
-            glUniform1i(glGetUniformLocation(shaderProgram.Id, name+number), i)
-            glBindTexture(GL_TEXTURE_2D, self.textures[i].id)
-
-        glBindVertexArray(self.VAO)
-        glDrawElements(GL_TRIANGLES, len(self.indices), GL_UNSIGNED_INT, None)
-        glBindVertexArray(0)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, 0)
+        if name == "texture_diffuse":
+            number = str(diffuseNr)
+            diffuseNr += 1
+        elif name == "texture_specular":
+            number = str(specularNr)
+            specularNr += 1
+        elif(name == "texture_normal"):
+            number = str(normalNr)
+            normalNr += 1
+        elif(name == "texture_height"):
+            number = str(heightNr)
+            heightNr += 1
+
+        glUniform1i(glGetUniformLocation(shaderProgram.Id, name+number), i)
+        glBindTexture(GL_TEXTURE_2D, textures[i].id)
+
+def BindTextureArrays(shaderProgram: ShaderProgram, textures: list[Texture]) -> None:
+    """Bind the texture arrays of a material to one unit per slot (see
+    MATERIAL_SLOTS) and point the samplers (material_diffuse, ...) at them.
+    Slots without a texture get no array, the layers are set per draw.
+    """
+    arrays = {texture.type: texture.id for texture in textures}
+
+    for i, slot in enumerate(MATERIAL_SLOTS):
+        glActiveTexture(GL_TEXTURE0 + i)
+        glUniform1i(glGetUniformLocation(shaderProgram.Id, "material_" + slot.split("_")[1]), i)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, arrays.get(slot, 0))
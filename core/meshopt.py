@@ -0,0 +1,287 @@
+import numpy as np
+
+# post-transform vertex cache size the orderings are tuned for (FIFO, typical of desktop GPUs)
+CACHE_SIZE = 16
+
+def OptimizeMesh(vertices: np.ndarray, indices: np.ndarray, cacheSize: int = CACHE_SIZE) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Weld, reorder for the vertex cache and overdraw, then for vertex fetch.
+
+    Args:
+        vertices (np.ndarray): (n, k) vertices.
+        indices (np.ndarray): Triangle list indices.
+        cacheSize (int): Simulated vertex cache size.
+
+    Returns:
+        tuple: Optimized vertices and uint32 indices, and a dict with the
+            vertex counts before and after, and the ACMR before, after the
+            vertex cache pass and after the overdraw pass.
+    """
+    stats = {"vertices": [len(vertices), 0], "acmr": [ACMR(indices, cacheSize), 0.0, 0.0]}
+
+    vertices, indices = WeldVertices(vertices, indices)
+    indices, clusters = OptimizeVertexCache(indices, len(vertices), cacheSize)
+    stats["acmr"][1] = ACMR(indices, cacheSize)
+    indices = OptimizeOverdraw(vertices[:, :3], indices, clusters)
+    vertices, indices = OptimizeVertexFetch(vertices, indices)
+
+    stats["vertices"][1] = len(vertices)
+    stats["acmr"][2] = ACMR(indices, cacheSize)
+
+    return vertices, indices, stats
+
+def ACMR(indices: np.ndarray, cacheSize: int = CACHE_SIZE) -> float:
+    """Average cache miss ratio (transformed vertices per triangle) of a
+    triangle list on a FIFO vertex cache. 3.0 is the worst case, ~0.5 the
+    best a closed mesh can reach.
+    """
+    numTriangles = len(indices) // 3
+    if numTriangles == 0:
+        return 0.0
+
+    cache = [-1] * cacheSize
+    cached = set()
+    head = 0
+    misses = 0
+    for v in np.asarray(indices).tolist():
+        if v not in cached:
+            cached.discard(cache[head])
+            cache[head] = v
+            cached.add(v)
+            head = (head + 1) % cacheSize
+            misses += 1
+
+    return misses / numTriangles
+
+def WeldVertices(vertices: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merge bit-identical vertices.
+
+    Returns:
+        tuple: Unique vertices and the uint32 indices remapped onto them.
+    """
+    if len(vertices) == 0:
+        return vertices, np.asarray(indices, dtype=np.uint32)
+
+    vertices = np.ascontiguousarray(vertices)
+    rows = vertices.view(np.dtype((np.void, vertices.dtype.itemsize * vertices.shape[1]))).reshape(-1)
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+    return vertices[first], inverse.reshape(-1).astype(np.uint32)[indices]
+
+def OptimizeVertexCache(indices: np.ndarray, numVertices: int, cacheSize: int = CACHE_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """Reorder triangles for the post-transform vertex cache (Tipsify,
+    Sander, Nehab & Barczak 2007).
+
+    Returns:
+        tuple: Reordered uint32 indices and the first triangle of every
+            cluster (runs starting with a full cache miss), for OptimizeOverdraw.
+    """
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    numTriangles = len(triangles)
+    if numTriangles == 0:
+        return np.asarray(indices, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+
+    # triangles around every vertex
+    corners = triangles.reshape(-1)
+    adjacency = (np.argsort(corners, kind="stable") // 3).tolist()
+    liveCount = np.bincount(corners, minlength=numVertices).tolist()
+    adjacencyOffsets = [0] + np.cumsum(liveCount).tolist()
+
+    triangleList = triangles.tolist()
+    timestamps = [0] * numVertices
+    emitted = [False] * numTriangles
+    deadEnd = []
+    time = cacheSize + 1
+    cursor = 0
+    output = []
+
+    fanning = 0
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[adjacencyOffsets[fanning]:adjacencyOffsets[fanning+1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            for v in triangleList[t]:
+                output.append(v)
+                deadEnd.append(v)
+                candidates.append(v)
+                liveCount[v] -= 1
+                if time - timestamps[v] > cacheSize:
+                    timestamps[v] = time
+                    time += 1
+
+        # next fanning vertex: a live one still in cache after its remaining triangles are emitted
+        fanning = -1
+        bestPriority = -1
+        for v in candidates:
+            if liveCount[v] > 0:
+                priority = 0
+                if time - timestamps[v] + 2 * liveCount[v] <= cacheSize:
+                    priority = time - timestamps[v]
+                if priority > bestPriority:
+                    fanning = v
+                    bestPriority = priority
+
+        if fanning == -1:
+            while deadEnd:
+                v = deadEnd.pop()
+                if liveCount[v] > 0:
+                    fanning = v
+                    break
+
+        if fanning == -1:
+            while cursor < numVertices:
+                if liveCount[cursor] > 0:
+                    fanning = cursor
+                    break
+                cursor += 1
+
+    indices = np.array(output, dtype=np.uint32)
+    return indices, CacheClusters(indices, cacheSize)
+
+def CacheClusters(indices: np.ndarray, cacheSize: int = CACHE_SIZE) -> np.ndarray:
+    """First triangle of every run of triangles that starts with all three
+    vertices missing the cache. Reordering such runs keeps the ACMR close,
+    only the vertices still cached across the new boundaries change.
+    """
+    cache = [-1] * cacheSize
+    cached = set()
+    head = 0
+    starts = []
+    for t, triangle in enumerate(np.asarray(indices).reshape(-1, 3).tolist()):
+        misses = 0
+        for v in triangle:
+            if v not in cached:
+                cached.discard(cache[head])
+                cache[head] = v
+                cached.add(v)
+                head = (head + 1) % cacheSize
+                misses += 1
+        if misses == 3 or t == 0:
+            starts.append(t)
+
+    return np.array(starts, dtype=np.int64)
+
+def OptimizeOverdraw(positions: np.ndarray, indices: np.ndarray, clusters: np.ndarray) -> np.ndarray:
+    """Sort triangle clusters so outward facing, outlying ones are drawn
+    first and occlude the rest from most view directions (Sander et al.'s
+    view-independent metric).
+
+    Args:
+        positions (np.ndarray): (n, 3) vertex positions.
+        indices (np.ndarray): Cache optimized triangle list.
+        clusters (np.ndarray): First triangle of every cluster.
+
+    Returns:
+        np.ndarray: Reordered uint32 indices.
+    """
+    triangles = np.asarray(indices).reshape(-1, 3)
+    if len(clusters) < 2:
+        return np.asarray(indices, dtype=np.uint32)
+
+    corners = np.asarray(positions, dtype=np.float64)[triangles]
+    crosses = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(crosses, axis=1) * 0.5
+    centroids = corners.mean(axis=1)
+
+    # area weighted cluster centroids and normals
+    clusterIds = np.repeat(np.arange(len(clusters)), np.diff(np.append(clusters, len(triangles))))
+    weights = np.bincount(clusterIds, weights=areas)
+    weights[weights == 0] = 1.0
+    clusterCentroids = np.stack([np.bincount(clusterIds, weights=centroids[:, k] * areas) for k in range(3)], axis=1) / weights[:, None]
+    clusterNormals = np.stack([np.bincount(clusterIds, weights=crosses[:, k]) for k in range(3)], axis=1)
+    lengths = np.linalg.norm(clusterNormals, axis=1)
+    lengths[lengths == 0] = 1.0
+    clusterNormals /= lengths[:, None]
+
+    meshCentroid = np.average(centroids, axis=0, weights=areas) if areas.sum() > 0 else centroids.mean(axis=0)
+    metric = np.einsum("ij,ij->i", clusterCentroids - meshCentroid, clusterNormals)
+
+    rank = np.empty(len(clusters), dtype=np.int64)
+    rank[np.argsort(-metric, kind="stable")] = np.arange(len(clusters))
+
+    return triangles[np.argsort(rank[clusterIds], kind="stable")].reshape(-1).astype(np.uint32)
+
+def OptimizeVertexFetch(vertices: np.ndarray, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Order vertices by first use in the index buffer and drop unused ones.
+
+    Returns:
+        tuple: Reordered vertices and the remapped uint32 indices.
+    """
+    indices = np.asarray(indices)
+    used, first = np.unique(indices, return_index=True)
+    order = used[np.argsort(first, kind="stable")]
+
+    remap = np.zeros(len(vertices), dtype=np.uint32)
+    remap[order] = np.arange(len(order), dtype=np.uint32)
+
+    return vertices[order], remap[indices]
+
+def SimplifyMesh(vertices: np.ndarray, indices: np.ndarray, targetTriangles: int) -> tuple[np.ndarray, np.ndarray]:
+    """Simplify a mesh to about targetTriangles by vertex clustering
+    (Rossignac & Borrel), searching the finest grid that reaches the target.
+
+    Returns:
+        tuple: Simplified vertices and uint32 indices, cache and fetch
+            optimized. The input is returned when no grid reduces it.
+    """
+    low, high = 1, 1024
+    best = None
+    while low <= high:
+        gridSize = (low + high) // 2
+        simplified = ClusterVertices(vertices, indices, gridSize)
+        if len(simplified[1]) // 3 <= targetTriangles:
+            best = simplified
+            low = gridSize + 1
+        else:
+            high = gridSize - 1
+
+    if best is None or len(best[1]) == 0:
+        return vertices, np.asarray(indices, dtype=np.uint32)
+
+    simplifiedVertices, simplifiedIndices = best
+    simplifiedIndices, clusters = OptimizeVertexCache(simplifiedIndices, len(simplifiedVertices))
+    return OptimizeVertexFetch(simplifiedVertices, simplifiedIndices)
+
+def ClusterVertices(vertices: np.ndarray, indices: np.ndarray, gridSize: int) -> tuple[np.ndarray, np.ndarray]:
+    """Collapse the vertices of every cell of a uniform grid over the mesh
+    bounds into one, then drop the degenerate and duplicated triangles.
+
+    The member closest to the cell mean stands for the cell, so normals and
+    texture coordinates stay those of a real vertex instead of a blend across
+    seams.
+
+    Args:
+        vertices (np.ndarray): (n, k) vertices, position first.
+        indices (np.ndarray): Triangle list indices.
+        gridSize (int): Cells along the longest side of the bounds.
+
+    Returns:
+        tuple: Vertices of the cells and the uint32 indices into them.
+    """
+    positions = np.asarray(vertices[:, :3], dtype=np.float64)
+    low = positions.min(axis=0)
+    cellSize = max(float((positions.max(axis=0) - low).max()), 1e-12) / gridSize
+
+    cells = np.minimum(((positions - low) / cellSize).astype(np.int64), gridSize - 1)
+    keys = (cells[:, 0] * gridSize + cells[:, 1]) * gridSize + cells[:, 2]
+    _, clusters = np.unique(keys, return_inverse=True)
+    clusters = clusters.reshape(-1)
+
+    counts = np.bincount(clusters)
+    means = np.stack([np.bincount(clusters, weights=positions[:, k]) for k in range(3)], axis=1) / counts[:, None]
+    distances = np.linalg.norm(positions - means[clusters], axis=1)
+
+    order = np.lexsort((distances, clusters))
+    representatives = order[np.flatnonzero(np.diff(clusters[order], prepend=-1))]
+
+    triangles = clusters[np.asarray(indices, dtype=np.int64)].reshape(-1, 3)
+    triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])]
+
+    # same triangle with the same winding, whatever corner it starts at
+    rotations = np.argmin(triangles, axis=1)
+    canonical = np.take_along_axis(triangles, (rotations[:, None] + np.arange(3)) % 3, axis=1)
+    _, first = np.unique(canonical, axis=0, return_index=True)
+    triangles = triangles[np.sort(first)]
+
+    return vertices[representatives], triangles.reshape(-1).astype(np.uint32)
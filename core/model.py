@@ -1,124 +1,499 @@
+import os
+from dataclasses import dataclass
+
 import pyassimp
 from pyassimp.material import *
 from pyassimp.postprocess import *
 
-from PIL import Image
+import numpy as np
 
 from OpenGL.GL import *
 import glm
 
-from .mesh import Mesh, Vertex, Texture
+from .cache import CacheFile, CachedBuild, HashFile, HashKey
+from .frustum import Bounds
+from .geometry import AcquireGeometry, ReleaseGeometry
+from .mesh import MATERIAL_SLOTS, BindTextureArrays, BindTextures, IndexArray, IndexType, PackVertices, Texture, Vertex, VertexArrayFromBuffers
+from .meshopt import ACMR, CACHE_SIZE, OptimizeMesh, SimplifyMesh
 from .shader import ShaderProgram
+from .texture import AcquireTexture, CompiledImage, ImageMeta, ImageShape, PrepareImages, QueueTextureUpload, ReleaseTexture, TextureArrayFromImages, UploadImage
+
+@dataclass
+class SubMesh:
+    levels: list[tuple[int,int,int]] # (first index, index count, base vertex) per LOD
+    textures: list[Texture]
+    boundsMin: np.ndarray
+    boundsMax: np.ndarray
+    layers: tuple[int,int,int,int] = None # texture array layer per MATERIAL_SLOTS entry, -1 without a map
 
 class Model:
-    def __init__(self, path: str):
-        self.meshes = []
+    PROCESSING_FLAGS = aiProcess_Triangulate | aiProcess_GenNormals | aiProcess_FlipUVs
+    CACHE_VERSION = 7 # bump when the cached layout changes
+    LOD_LEVELS = 4
+    LOD_REDUCTION = 0.5 # triangles kept from one level to the next
+    LOD_SCREEN_SIZES = (0.25, 0.1, 0.04) # projected diameter / viewport height where levels 1, 2, 3 start
+    COMPRESSED_TEXTURES = ("texture_diffuse", "texture_specular") # material textures stored GPU-compressed
+
+    # material pipelines: a GL_TEXTURE_2D per map, bound per sub-mesh, or the
+    # maps packed into GL_TEXTURE_2D_ARRAY layers, selected per draw
+    MATERIALS_TEXTURES = "textures"
+    MATERIALS_ARRAY = "array"
+
+    def __init__(self, path: str, vertexFormat: str = Vertex.FORMAT_FLOAT, keepGeometry: bool = False, streamed: bool = False, materials: str = MATERIALS_TEXTURES):
+        """Model imported with assimp.
+
+        Args:
+            path (str): Model file.
+            vertexFormat (str): GPU vertex layout, one of Vertex.FORMAT_*.
+            keepGeometry (bool): Keep the vertex and index blobs after the
+                upload, as memory-mapped views of the cache file, for CPU
+                access (picking, ...). By default only the GPU copy remains.
+            streamed (bool): Upload the textures in the background, see
+                QueueTextureUpload. They stay black until they arrive.
+            materials (str): Material pipeline, one of Model.MATERIALS_*.
+                MATERIALS_ARRAY needs shaders compiled with MATERIAL_ARRAYS
+                defined.
+        """
+        if vertexFormat not in [Vertex.FORMAT_FLOAT, Vertex.FORMAT_PACKED, Vertex.FORMAT_QUANTIZED]:
+            message = "Model does not support '" + vertexFormat + "' vertex format!"
+            raise ValueError(message)
+
+        if materials not in [Model.MATERIALS_TEXTURES, Model.MATERIALS_ARRAY]:
+            message = "Model does not support '" + materials + "' material pipeline!"
+            raise ValueError(message)
+
+        self.vertexFormat = vertexFormat
+        self.materials = materials
+        self.keepGeometry = keepGeometry
+        self.streamed = streamed
+        self.vertices = None
+        self.indices = None
+        self.subMeshes = []
         self.texturesLoaded = []
+        self.drawCalls = 0
+        self.textureBinds = 0
+        self.numTriangles = 0
+        self.meshStats = []
         self.__loadModel(path)
     
-    def draw(self, shaderProgram: ShaderProgram) -> None:
-        for mesh in self.meshes:
-           mesh.draw(shaderProgram)
+    def draw(self, shaderProgram: ShaderProgram, level: int = 0) -> None:
+        # all sub-meshes live in one buffer pair, one multi-draw per run of sub-meshes with the same textures
+        batches = self.batches[level]
+
+        glBindVertexArray(self.VAO)
+        bound = None
+        self.textureBinds = 0
+        for textures, layers, counts, offsets, baseVertices in batches:
+            # texture arrays usually stay bound for the whole model, only the layers change
+            if textures != bound:
+                if self.materials == Model.MATERIALS_ARRAY:
+                    BindTextureArrays(shaderProgram, textures)
+                else:
+                    BindTextures(shaderProgram, textures)
+                bound = textures
+                self.textureBinds += 1
+            if layers is not None:
+                glUniform4i(glGetUniformLocation(shaderProgram.Id, "materialLayers"), *layers)
+            glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, self.indexType, offsets, len(counts), baseVertices)
+        glBindVertexArray(0)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+        self.drawCalls = len(batches)
+        self.numTriangles = self.lodTriangles[level]
+
+    def delete(self) -> None:
+        """Give back the shared GPU buffers and textures.
+        """
+        ReleaseGeometry(self.VAO)
+
+        for texture in self.texturesLoaded:
+            ReleaseTexture(texture.id)
+        self.texturesLoaded = []
+
+    def selectLod(self, screenSize: float) -> int:
+        """Level of detail for an instance of the model.
+
+        Args:
+            screenSize (float): Projected diameter of the instance's bounding
+                sphere over the viewport height, see ScreenSize.
+
+        Returns:
+            int: LOD level, 0 being the full resolution mesh.
+        """
+        level = sum(1 for size in Model.LOD_SCREEN_SIZES if screenSize < size)
+        return min(level, Model.LOD_LEVELS - 1)
+
+    def meshReport(self) -> str:
+        """Vertex welding and vertex cache results of the import optimization.
+        """
+        before = sum(stats["vertices"][0] for stats in self.meshStats)
+        after = sum(stats["vertices"][1] for stats in self.meshStats)
+
+        # ACMR of the whole model, weighted by triangles
+        triangles = np.array([stats["triangles"] for stats in self.meshStats] or [0])
+        acmrBefore = np.array([stats["acmr"][0] for stats in self.meshStats] or [0.0])
+        acmrCache = np.array([stats["acmr"][1] for stats in self.meshStats] or [0.0])
+        acmrAfter = np.array([stats["acmr"][2] for stats in self.meshStats] or [0.0])
+        total = max(int(triangles.sum()), 1)
+
+        report = "vertices %d -> %d" % (before, after)
+        report += ", ACMR %.3f -> %.3f -> %.3f (vertex cache, overdraw order)" % tuple((triangles * acmr).sum() / total for acmr in (acmrBefore, acmrCache, acmrAfter))
+        report += ", LOD triangles " + "/".join(str(n) for n in self.lodTriangles)
+        report += ", vertex buffer %.2f MB (%s)" % (self.vertexBytes / 2**20, self.vertexFormat)
+        report += ", index buffer %.2f MB (%d bit)" % (self.indexBytes / 2**20, 16 if self.indexType == GL_UNSIGNED_SHORT else 32)
+        return report
     
     def __loadModel(self, path: str) -> None:
-        processingFlags = aiProcess_Triangulate | aiProcess_GenNormals | aiProcess_FlipUVs
-        with pyassimp.load(path, processing=processingFlags) as scene:
+        self.directory = "/".join(path.split("/")[:-1])
+
+        # a warm start maps the imported buffers from disk instead of running assimp
+        # the material libraries are part of the key, the cache keeps the texture references read from them
+        libraries = [(library, HashFile(library) if os.path.isfile(library) else None) for library in MaterialLibraries(path)]
+        key = HashKey(HashFile(path), libraries, Model.PROCESSING_FLAGS, CACHE_SIZE, Model.LOD_LEVELS, Model.LOD_REDUCTION, self.vertexFormat, Model.CACHE_VERSION)
+        cacheFile = CacheFile("models", path + "." + self.vertexFormat, key)
+
+        self.__setupModel(*CachedBuild(cacheFile, lambda: self.__importModel(path)), key)
+
+    def __importModel(self, path: str) -> tuple[dict, dict]:
+        parts = []
+        with pyassimp.load(path, processing=Model.PROCESSING_FLAGS) as scene:
             assert scene.rootnode
-            self.directory = "/".join(path.split("/")[:-1])
-            self.__processNode(scene.rootnode, scene)
+            self.__processNode(scene.rootnode, scene, parts)
+
+        # all meshes and their levels go into one vertex and one index blob, the metadata keeps their ranges
+        meshes = []
+        vertexBlocks = []
+        indexBlocks = []
+        firstVertex = 0
+        firstIndex = 0
+        for levels, textures, stats in parts:
+            ranges = []
+            for level, (vertices, indices) in enumerate(levels):
+                if level > 0 and levels[level] is levels[level - 1]:
+                    ranges.append(ranges[-1])
+                    continue
+                ranges.append([firstIndex, len(indices), firstVertex])
+                vertexBlocks.append(vertices)
+                indexBlocks.append(indices)
+                firstVertex += len(vertices)
+                firstIndex += len(indices)
+
+            boundsMin, boundsMax, _, _ = Bounds(levels[0][0][:, 0:3])
+            meshes.append({"levels": ranges, "textures": textures, "stats": stats, "bounds": [boundsMin.tolist(), boundsMax.tolist()]})
+
+        # indices are local to their block (the base vertex does the rest), so the largest block sets the width
+        largestBlock = max([len(vertices) for vertices in vertexBlocks] or [0])
+        arrays = {
+            "vertices": np.concatenate(vertexBlocks) if vertexBlocks else np.zeros((0, 8), dtype=np.float32),
+            "indices": IndexArray(np.concatenate(indexBlocks) if indexBlocks else np.zeros(0), largestBlock),
+        }
+
+        # bounds and a bounding sphere around their center, for culling, LOD selection and quantization
+        boundsMin, boundsMax, center, radius = Bounds(arrays["vertices"][:, 0:3])
+
+        if self.vertexFormat != Vertex.FORMAT_FLOAT:
+            arrays["vertices"] = PackVertices(arrays["vertices"], self.vertexFormat, boundsMin, boundsMax)
+
+        meta = {"meshes": meshes, "sphere": center.tolist() + [radius], "bounds": [boundsMin.tolist(), boundsMax.tolist()]}
+
+        return arrays, meta
+
+    def __setupModel(self, arrays: dict, meta: dict, key: str) -> None:
+        # the (memory-mapped when cached) blobs are uploaded as they are, sub-meshes keep their ranges
+        # models of the same file contents share the buffers, keyed by the cache key so no page of the blobs is read
+        self.VAO, self.VBO, self.EBO = AcquireGeometry(self.vertexFormat, arrays["vertices"], arrays["indices"], lambda: VertexArrayFromBuffers(arrays["vertices"], arrays["indices"], self.vertexFormat), "model." + key)
+        self.vertexBytes = arrays["vertices"].nbytes
+        self.indexBytes = arrays["indices"].nbytes
+        self.indexType = IndexType(arrays["indices"])
+
+        # the blobs are views of the cache file (unless it could not be written), pages the OS can drop
+        if self.keepGeometry:
+            self.vertices = arrays["vertices"]
+            self.indices = arrays["indices"]
+
+        if self.materials == Model.MATERIALS_ARRAY:
+            layers = self.__loadMaterialArrays([file for part in meta["meshes"] for file in part["textures"]])
+            # a slot a sub-mesh does not sample keeps the model's first array for it, so the bind stays shared
+            defaults = {}
+            for texture, _ in layers.values():
+                defaults.setdefault(texture.type, texture)
+
+        for part in meta["meshes"]:
+            if self.materials == Model.MATERIALS_ARRAY:
+                # the array and layer of the first map of every slot
+                slots = dict(defaults)
+                subMeshLayers = [-1] * len(MATERIAL_SLOTS)
+                for typeName, path in part["textures"]:
+                    if typeName in MATERIAL_SLOTS and subMeshLayers[MATERIAL_SLOTS.index(typeName)] < 0:
+                        slots[typeName], subMeshLayers[MATERIAL_SLOTS.index(typeName)] = layers[(typeName, path)]
+                textures = [slots[slot] for slot in MATERIAL_SLOTS if slot in slots]
+                self.subMeshes.append(SubMesh([tuple(r) for r in part["levels"]], textures, *np.array(part["bounds"]), tuple(subMeshLayers)))
+            else:
+                textures = []
+                for typeName, path in part["textures"]:
+                    textures.append(self.__loadMaterialTexture(path, typeName))
+                self.subMeshes.append(SubMesh([tuple(r) for r in part["levels"]], textures, *np.array(part["bounds"])))
+            self.meshStats.append(part["stats"])
+
+        self.boundsMin, self.boundsMax = np.array(meta["bounds"])
+        self.sphereCenter = glm.vec3(*meta["sphere"][:3])
+        self.sphereRadius = meta["sphere"][3]
+
+        # maps quantized [0,1] positions back onto the bounds, to be folded into the model matrix
+        self.dequantization = glm.mat4(1.0)
+        if self.vertexFormat == Vertex.FORMAT_QUANTIZED:
+            extent = self.boundsMax - self.boundsMin
+            extent[extent == 0] = 1.0
+            self.dequantization = glm.scale(glm.translate(glm.mat4(1.0), glm.vec3(*self.boundsMin)), glm.vec3(*extent))
+
+        self.batches = [DrawBatches(self.subMeshes, level, arrays["indices"].itemsize) for level in range(Model.LOD_LEVELS)]
+        self.lodTriangles = [sum(s.levels[level][1] for s in self.subMeshes) // 3 for level in range(Model.LOD_LEVELS)]
             
-    def __processNode(self, node, scene) -> None:
+    def __processNode(self, node, scene, parts: list) -> None:
         for mesh in node.meshes:
-            self.meshes.append(self.__processMesh(mesh, scene))
+            parts.append(self.__processMesh(mesh, scene))
         
         for child in node.children:
-            self.__processNode(child, scene)
+            self.__processNode(child, scene, parts)
         
-    def __processMesh(self, mesh, scene) -> Mesh:
-        vertices = []
-        indices = []
+    def __processMesh(self, mesh, scene) -> tuple[list, list, dict]:
         textures = []
         
-        for i in range(len(mesh.vertices)):
-            position = glm.vec3(mesh.vertices[i][0], mesh.vertices[i][1], mesh.vertices[i][2])
-
-            normal = glm.vec3(0,0,0)
-            if len(mesh.normals) > 0:
-                normal = glm.vec3(mesh.normals[i][0], mesh.normals[i][1], mesh.normals[i][2])
+        # assimp leaves the faces unshared and in file order: weld, then reorder for the vertex cache and overdraw
+        vertices, indices = ArraysFromAssimpMesh(mesh)
+        if len(indices) % 3 == 0:
+            vertices, indices, stats = OptimizeMesh(vertices, indices)
+        else:
+            stats = {"vertices": [len(vertices)] * 2, "acmr": [ACMR(indices)] * 3}
+        stats["triangles"] = len(indices) // 3
 
-            texCoord = glm.vec2(0,0)
-            if len(mesh.texturecoords) > 0 and mesh.texturecoords[0] is not None:
-                texCoord = glm.vec2(mesh.texturecoords[0][i][0], mesh.texturecoords[0][i][1])
-
-            vertices.append(Vertex(position,normal,texCoord))
-        
-        for face in mesh.faces:
-            for i in face:
-                indices.append(i)
+        # coarser levels by vertex clustering, a level that cannot be reduced repeats the previous one
+        levels = [(vertices, indices)]
+        for level in range(1, Model.LOD_LEVELS):
+            previous = levels[-1]
+            if len(indices) % 3 == 0 and len(previous[1]) >= 3:
+                simplified = SimplifyMesh(*previous, int(stats["triangles"] * Model.LOD_REDUCTION ** level))
+                if len(simplified[1]) < len(previous[1]):
+                    previous = simplified
+            levels.append(previous)
 
         if mesh.materialindex:
             material = scene.materials[mesh.materialindex]
             
-            diffuseMaps = self.__loadMaterialTextures(material, aiTextureType_DIFFUSE, "texture_diffuse")
+            diffuseMaps = self.__materialTextureFiles(material, aiTextureType_DIFFUSE, "texture_diffuse")
             textures += diffuseMaps
             
-            specularMaps = self.__loadMaterialTextures(material, aiTextureType_SPECULAR, "texture_specular")
+            specularMaps = self.__materialTextureFiles(material, aiTextureType_SPECULAR, "texture_specular")
             textures += specularMaps
             
-            normalMaps = self.__loadMaterialTextures(material, aiTextureType_HEIGHT, "texture_normal")
+            normalMaps = self.__materialTextureFiles(material, aiTextureType_HEIGHT, "texture_normal")
             textures += normalMaps
             
-            heightMaps = self.__loadMaterialTextures(material, aiTextureType_AMBIENT, "texture_height")
+            heightMaps = self.__materialTextureFiles(material, aiTextureType_AMBIENT, "texture_height")
             textures += heightMaps
 
-        return Mesh(vertices,indices,textures)
+        return levels, textures, stats
             
-    def __loadMaterialTextures(self, mat, type, typeName: str) -> list[Texture]:
-        textures = []
-        
+    def __materialTextureFiles(self, mat, type, typeName: str) -> list[list[str]]:
         files = mat.properties.get(("file", type))
         
         if not files:
-            return textures
+            return []
         
         if not isinstance(files,list): # TODO: check if when there is more than 1 file for the same category it converts to a list or adds another key to the dict
             files = [files]
 
-        for path in files:
-            skip = False
-            for tex in self.texturesLoaded:
-                if tex.path == path:
-                    textures.append(tex)
-                    skip = True
-                    break
-            
-            if not skip:
-                textureId = TextureFromFile(path, self.directory)
-                texture = Texture(textureId, typeName, path)
-                textures.append(texture)
-                self.texturesLoaded.append(texture)
-        
-        return textures
+        return [[typeName, str(path)] for path in files]
+
+    def __loadMaterialTexture(self, path: str, typeName: str) -> Texture:
+        for tex in self.texturesLoaded:
+            if tex.path == path:
+                return tex
+
+        # shared with every other asset using the same image
+        # color maps are block compressed, normal and height maps keep their precision
+        compress = typeName in Model.COMPRESSED_TEXTURES
+        textureId = AcquireTexture("2d" + (".compressed" if compress else ""), [self.directory + "/" + path], lambda: TextureFromFile(path, self.directory, compress, self.streamed))
+        texture = Texture(textureId, typeName, path)
+        self.texturesLoaded.append(texture)
+        return texture
+
+    def __loadMaterialArrays(self, files: list[list[str]]) -> dict:
+        # maps of the same size and format share a texture array, whatever their slot
+        files = list(dict.fromkeys((typeName, path) for typeName, path in files if typeName in MATERIAL_SLOTS))
+        images = [(self.directory + "/" + path, True, True, typeName in Model.COMPRESSED_TEXTURES) for typeName, path in files]
+
+        # streamed, only the headers (or cached metadata) are read here and the uploads decode the layers
+        if self.streamed:
+            compiled = [None] * len(images)
+            metas = [ImageMeta(*image) for image in images]
+        else:
+            compiled = PrepareImages(images)
+            metas = [meta for _, meta in compiled]
+
+        groups = {}
+        for file, image, meta, c in zip(files, images, metas, compiled):
+            groups.setdefault(ImageShape(meta), []).append((file, image, meta, c))
+
+        layers = {}
+        for shape, members in groups.items():
+            groupImages = [image for _, image, _, _ in members]
+            groupMetas = [meta for _, _, meta, _ in members]
+            groupCompiled = None if self.streamed else [c for _, _, _, c in members]
+
+            # shared with every other model packing the same maps
+            kind = "array." + ".".join(str(n) for n in shape)
+            textureId = AcquireTexture(kind, [image[0] for image in groupImages], lambda: self.__textureArray(groupImages, groupMetas, groupCompiled))
+            for layer, ((typeName, path), _, _, _) in enumerate(members):
+                # no path, so sub-meshes sampling the same arrays compare equal and share the bind
+                layers[(typeName, path)] = (Texture(textureId, typeName, ""), layer)
+            self.texturesLoaded.append(Texture(textureId, "array", ""))
+
+        return layers
+
+    def __textureArray(self, images: list[tuple], metas: list[dict], compiled: list[tuple]) -> int:
+        textureId = TextureArrayFromImages(images, metas, compiled)
+
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+        return textureId
+
+def ScreenSize(center: glm.vec3, radius: float, cameraPos: glm.vec3, projection: glm.mat4) -> float:
+    """Projected diameter of a sphere over the viewport height.
+
+    Args:
+        center (glm.vec3): World space center.
+        radius (float): World space radius.
+        cameraPos (glm.vec3): Camera position.
+        projection (glm.mat4): Perspective projection matrix.
+    """
+    distance = max(glm.length(center - cameraPos), 1e-6)
+    return radius * projection[1][1] / distance
+
+def DrawBatches(subMeshes: list[SubMesh], level: int = 0, indexSize: int = 4) -> list[tuple]:
+    """Group consecutive sub-meshes with the same textures into multi-draws.
+
+    Args:
+        subMeshes (list[SubMesh]): Sub-meshes in buffer order.
+        level (int): LOD level.
+        indexSize (int): Bytes per index of the shared index buffer.
+
+    Returns:
+        list: (textures, texture array layers or None, counts, byte offsets,
+            base vertices) per draw call, ready for glMultiDrawElementsBaseVertex.
+    """
+    runs = []
+    for subMesh in subMeshes:
+        if subMesh.levels[level][1] == 0:
+            continue
+        if runs and [t.id for t in runs[-1][0].textures] == [t.id for t in subMesh.textures] and runs[-1][0].layers == subMesh.layers:
+            runs[-1].append(subMesh)
+        else:
+            runs.append([subMesh])
 
-def TextureFromFile(path: str, directory: str):
+    batches = []
+    for run in runs:
+        ranges = [s.levels[level] for s in run]
+        counts = np.array([numIndices for _, numIndices, _ in ranges], dtype=np.int32)
+        offsets = (ctypes.c_void_p * len(run))(*[firstIndex * indexSize for firstIndex, _, _ in ranges])
+        baseVertices = np.array([baseVertex for _, _, baseVertex in ranges], dtype=np.int32)
+        batches.append((run[0].textures, run[0].layers, counts, offsets, baseVertices))
+
+    return batches
+
+def MaterialLibraries(path: str) -> list[str]:
+    """Material library files (mtllib) a Wavefront .obj file refers to,
+    resolved against its directory. Other formats keep their materials in
+    the model file itself.
+    """
+    if os.path.splitext(path)[1].lower() != ".obj":
+        return []
+
+    libraries = []
+    with open(path, "rb") as file:
+        for line in file:
+            if line.startswith(b"mtllib"):
+                for name in line.decode(errors="replace").split()[1:]:
+                    libraries.append(os.path.join(os.path.dirname(path), name))
+
+    return libraries
+
+def MaterialTextureFiles(path: str) -> list[list[str]]:
+    """[type name, file] of every map in the material libraries of an .obj
+    file, read as assimp does for the import (map_Bump is the normal map,
+    map_Ka the height map) but without importing the model. Files are
+    relative to the model directory.
+    """
+    types = {"map_kd": "texture_diffuse", "map_ks": "texture_specular", "map_bump": "texture_normal", "bump": "texture_normal", "map_ka": "texture_height"}
+
+    files = []
+    for library in MaterialLibraries(path):
+        if not os.path.isfile(library):
+            continue
+        with open(library, "r", errors="replace") as file:
+            for line in file:
+                tokens = line.split()
+                # options (-bm 1.0, ...) come before the file name
+                if len(tokens) > 1 and tokens[0].lower() in types:
+                    files.append([types[tokens[0].lower()], tokens[-1]])
+
+    # materials often share maps, each is listed once
+    return [list(entry) for entry in dict.fromkeys(map(tuple, files))]
+
+def ArraysFromAssimpMesh(mesh) -> tuple[np.ndarray, np.ndarray]:
+    """Interleaved vertex buffer and index buffer of an assimp mesh.
+
+    Returns:
+        tuple: (n, 8) float32 vertices laid out as Vertex (position, normal,
+            texture coordinates) and the flat uint32 face indices.
+    """
+    positions = np.asarray(mesh.vertices, dtype=np.float32).reshape(-1, 3)
+
+    vertices = np.zeros((len(positions), Vertex.size() // glm.sizeof(glm.float32)), dtype=np.float32)
+    vertices[:, 0:3] = positions
+
+    if len(mesh.normals) > 0:
+        vertices[:, 3:6] = np.asarray(mesh.normals, dtype=np.float32).reshape(-1, 3)
+
+    if len(mesh.texturecoords) > 0 and mesh.texturecoords[0] is not None:
+        vertices[:, 6:8] = np.asarray(mesh.texturecoords[0], dtype=np.float32)[:, :2]
+
+    # faces are a (n, 3) array once triangulated, but points and lines can be left over
+    faces = mesh.faces
+    if isinstance(faces, np.ndarray) and faces.dtype != object:
+        indices = faces.astype(np.uint32).reshape(-1)
+    elif len(faces) > 0:
+        indices = np.concatenate([np.asarray(face, dtype=np.uint32).reshape(-1) for face in faces])
+    else:
+        indices = np.zeros(0, dtype=np.uint32)
+
+    return vertices, indices
+
+def TextureFromFile(path: str, directory: str, compress: bool = False, streamed: bool = False):
     filename = directory + "/" + path
+
+    # decoded, flipped and mipmapped once, then mapped from the texture cache
+    compiled = None if streamed else CompiledImage(filename, True, True, compress)
+
     textureId = glGenTextures(1)
-   
-    with Image.open(filename).transpose(Image.FLIP_TOP_BOTTOM) as img:
-        nrComponents = len(img.getbands())
-        format = GL_RED if nrComponents == 1 else \
-                 GL_RGB if nrComponents == 3 else \
-                 GL_RGBA
-        
-        glBindTexture(GL_TEXTURE_2D, textureId)
-        glTexImage2D(GL_TEXTURE_2D, 0, format, img.width, img.height, 0, format, GL_UNSIGNED_BYTE, img.tobytes())
-        glGenerateMipmap(GL_TEXTURE_2D)
+    glBindTexture(GL_TEXTURE_2D, textureId)
+    if compiled is None:
+        QueueTextureUpload(textureId, GL_TEXTURE_2D, GL_TEXTURE_2D, filename, True, True, compress)
+    else:
+        UploadImage(GL_TEXTURE_2D, *compiled)
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        glBindTexture(GL_TEXTURE_2D, 0)
+    glBindTexture(GL_TEXTURE_2D, 0)
     
     return textureId
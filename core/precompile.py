@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import time
+from glob import glob
+
+from .cache import ReadCache
+from .model import MaterialTextureFiles, Model
+from .texture import ImageCacheFile, PrepareImages
+
+SKYBOX_FACES = ("right", "left", "top", "bottom", "front", "back")
+
+def AssetImages(assets: dict) -> list[tuple]:
+    """CompiledImage arguments of every texture of an assets database, as
+    Model and Skybox load them: material maps of the models (flipped,
+    mipmapped) and skybox faces (with their compress and maxSize options).
+    """
+    images = []
+    for model in assets.get("models", {}).values():
+        if not os.path.isfile(model["path"]):
+            print("Could not find model '" + model["path"] + "'", file=sys.stderr)
+            continue
+        directory = "/".join(model["path"].split("/")[:-1])
+        for typeName, path in MaterialTextureFiles(model["path"]):
+            images.append((directory + "/" + path, True, True, typeName in Model.COMPRESSED_TEXTURES, 0))
+
+    for skybox in assets.get("skyboxes", {}).values():
+        for face in SKYBOX_FACES:
+            paths = glob(os.path.join(skybox["path"], face + ".*"))
+            if len(paths) > 0:
+                images.append((paths[0], False, False, skybox.get("compress", True), skybox.get("maxSize", 0)))
+
+    return list(dict.fromkeys(images))
+
+def PrecompileTextures(assets: dict) -> tuple[int, int]:
+    """Compile every texture of an assets database into the texture cache,
+    so the application only maps them on its first start. Needs a current
+    GL context for the compressed formats.
+
+    Returns:
+        tuple: Number of textures compiled and of textures already cached.
+    """
+    images = []
+    for image in AssetImages(assets):
+        if os.path.isfile(image[0]):
+            images.append(image)
+        else:
+            print("Could not find texture '" + image[0] + "'", file=sys.stderr)
+
+    cached = sum(ReadCache(ImageCacheFile(*image)) is not None for image in images)
+    PrepareImages(images)
+
+    return len(images) - cached, cached
+
+if __name__ == "__main__":
+    # offline compile step: python -m core.precompile [assets.json]
+    import pygame as pg
+
+    with open(sys.argv[1] if len(sys.argv) > 1 else "assets.json", "r") as file:
+        assets = json.load(file)
+
+    # a hidden window for the context the driver compresses with
+    pg.init()
+    pg.display.set_mode((64, 64), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+
+    start = time.perf_counter()
+    compiled, cached = PrecompileTextures(assets)
+    print("%d textures compiled, %d already cached (%.1f s)" % (compiled, cached, time.perf_counter() - start))
+
+    pg.quit()
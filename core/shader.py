@@ -4,14 +4,21 @@ from OpenGL.GL import shaders
 import glm
 
 class ShaderProgram:
-    def __init__(self, vertexShaderCode: str, fragmentShaderCode: str, geometryShaderCode: str = None):
+    def __init__(self, vertexShaderCode: str, fragmentShaderCode: str, geometryShaderCode: str = None, defines: list[str] = None):
         """Object representation of a shader program.
 
         Args:
             vertexShaderCode (str): String of vertex shader code.
             fragmentShaderCode (str): String of fragment shader code.
             geometryShaderCode (str, optional): String of geometry shader code. Defaults to None.
+            defines (list[str], optional): Macros defined in every stage, after the #version line. Defaults to None.
         """
+        if defines:
+            vertexShaderCode = DefineMacros(vertexShaderCode, defines)
+            fragmentShaderCode = DefineMacros(fragmentShaderCode, defines)
+            if geometryShaderCode:
+                geometryShaderCode = DefineMacros(geometryShaderCode, defines)
+
         if geometryShaderCode:
             self.Id = shaders.compileProgram(
                 shaders.compileShader(vertexShaderCode, GL_VERTEX_SHADER),
@@ -142,3 +149,10 @@ class ShaderProgram:
     #         ret = glGetProgramiv(shader, GL_LINK_STATUS)
     #         if not ret:
     #             raise RuntimeError(glGetProgramInfoLog(shader))
+
+def DefineMacros(code: str, defines: list[str]) -> str:
+    """Insert a #define per macro after the #version line of shader code.
+    """
+    lines = code.split("\n")
+    at = 1 if lines and lines[0].lstrip().startswith("#version") else 0
+    return "\n".join(lines[:at] + ["#define " + define for define in defines] + lines[at:])
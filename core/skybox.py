@@ -1,14 +1,45 @@
+import sys
+
 import numpy as np
 
 from OpenGL.GL import *
-import glm
 
+from .geometry import AcquireCube, ReleaseGeometry
+from .ibl import QueueSkyLighting
 from .shader import ShaderProgram
+from .texture import AcquireTexture, LoadTextureImages, ReleaseTexture, TextureLoadTimes
 
 class Skybox:
-    def __init__(self, faces: list[str]):
-        self.__loadGeometry()
-        self.__loadCubemap(faces)
+    IRRADIANCE_UNIT = 8 # texture units of the lighting maps, clear of the material textures
+    PREFILTERED_UNIT = 9
+
+    def __init__(self, faces: list[str], compress: bool = True, streamed: bool = False, maxSize: int = 0, lighting: bool = True):
+        """Cubemap skybox.
+
+        Args:
+            faces (list[str]): Images of the +X, -X, +Y, -Y, +Z and -Z faces.
+            compress (bool): Keep the faces GPU-compressed when the driver can.
+            streamed (bool): Upload the faces in the background, see
+                QueueTextureUpload. The sky stays black until they arrive.
+            maxSize (int): Downscale faces larger than this, for low VRAM
+                deployments. 0 keeps the full resolution.
+            lighting (bool): Load the irradiance and pre-filtered maps of the
+                sky (see SkyLighting) for the ambient light of the models,
+                built in the background. Flat ambient light until then.
+        """
+        # the cube is shared with the light gizmos and any other skybox
+        self.VAO, self.VBO, _ = AcquireCube()
+
+        # shared with any other skybox made of the same images
+        kind = "cubemap" + (".compressed" if compress else "") + ("." + str(maxSize) if maxSize > 0 else "")
+        self.textureId = AcquireTexture(kind, faces, lambda: self.__loadCubemap(faces, compress, streamed, maxSize))
+
+        # computed once per set of faces and then mapped from the cache, so switching skybox is free
+        self.faces = faces
+        self.irradianceId = None
+        self.prefilteredId = None
+        self.prefilteredLevels = 0
+        self.__lighting = QueueSkyLighting(faces) if lighting else None
    
     def draw(self, shaderProgram: ShaderProgram) -> None:
         glDepthFunc(GL_LEQUAL) # change depth function so depth test passes when values are equal to depth buffer's content
@@ -19,81 +50,104 @@ class Skybox:
         glDrawArrays(GL_TRIANGLES, 0, 36)
    
         glDepthFunc(GL_LESS)
-   
-    def __loadGeometry(self) -> None:
-        skyboxVertices = glm.array(np.array([
-            -1.0,  1.0, -1.0,
-            -1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            1.0,  1.0, -1.0,
-            -1.0,  1.0, -1.0,
-
-            -1.0, -1.0,  1.0,
-            -1.0, -1.0, -1.0,
-            -1.0,  1.0, -1.0,
-            -1.0,  1.0, -1.0,
-            -1.0,  1.0,  1.0,
-            -1.0, -1.0,  1.0,
-
-            1.0, -1.0, -1.0,
-            1.0, -1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0, -1.0,
-            1.0, -1.0, -1.0,
-
-            -1.0, -1.0,  1.0,
-            -1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            1.0, -1.0,  1.0,
-            -1.0, -1.0,  1.0,
-
-            -1.0,  1.0, -1.0,
-            1.0,  1.0, -1.0,
-            1.0,  1.0,  1.0,
-            1.0,  1.0,  1.0,
-            -1.0,  1.0,  1.0,
-            -1.0,  1.0, -1.0,
-
-            -1.0, -1.0, -1.0,
-            -1.0, -1.0,  1.0,
-            1.0, -1.0, -1.0,
-            1.0, -1.0, -1.0,
-            -1.0, -1.0,  1.0,
-            1.0, -1.0,  1.0
-        ], dtype=np.float32))
-
-        self.VAO = glGenVertexArrays(1)
-        self.VBO = glGenBuffers(1)
-        
-        glBindVertexArray(self.VAO)
-        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferData(GL_ARRAY_BUFFER, skyboxVertices.nbytes, skyboxVertices.ptr, GL_STATIC_DRAW)
-        
-        # vertex position 
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * glm.sizeof(glm.float32), None)
 
-        glBindVertexArray(0)
+    def setLighting(self, shaderProgram: ShaderProgram) -> None:
+        """Bind the irradiance and pre-filtered maps for the ambient light of
+        a model shader, or disable it if this skybox has none (yet).
+        """
+        if self.irradianceId is None and self.__lighting is not None and self.__lighting.done():
+            self.__uploadLighting()
 
-    def __loadCubemap(self, faces: list[str]) -> None:    
-        self.textureId = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_CUBE_MAP, self.textureId)
+        if self.irradianceId is None:
+            Skybox.disableLighting(shaderProgram)
+            return
+
+        glActiveTexture(GL_TEXTURE0 + Skybox.IRRADIANCE_UNIT)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.irradianceId)
+        glActiveTexture(GL_TEXTURE0 + Skybox.PREFILTERED_UNIT)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.prefilteredId)
+        glActiveTexture(GL_TEXTURE0)
+
+        shaderProgram.setBool("enableIBL", True)
+        shaderProgram.setInt("irradianceMap", Skybox.IRRADIANCE_UNIT)
+        shaderProgram.setInt("prefilteredMap", Skybox.PREFILTERED_UNIT)
+        shaderProgram.setFloat("prefilteredLevels", self.prefilteredLevels)
+
+    @staticmethod
+    def disableLighting(shaderProgram: ShaderProgram) -> None:
+        """Flat ambient light, for when no skybox is shown.
+        """
+        shaderProgram.setBool("enableIBL", False)
+
+        # the cube samplers still need units of their own, 0 holds a 2D texture
+        shaderProgram.setInt("irradianceMap", Skybox.IRRADIANCE_UNIT)
+        shaderProgram.setInt("prefilteredMap", Skybox.PREFILTERED_UNIT)
+
+    def delete(self) -> None:
+        """Give back the shared cube and cubemaps.
+        """
+        ReleaseGeometry(self.VAO)
+        ReleaseTexture(self.textureId)
+        if self.__lighting is not None:
+            self.__lighting.cancel()
+        if self.irradianceId is not None:
+            ReleaseTexture(self.irradianceId)
+            ReleaseTexture(self.prefilteredId)
 
-        from PIL import Image
-        for i in range(len(faces)):
-            with Image.open(faces[i]) as img:
-                nrComponents = len(img.getbands())
-                format = GL_RED if nrComponents == 1 else \
-                         GL_RGB if nrComponents == 3 else \
-                         GL_RGBA
-                
-                glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + i, 0, format, img.width, img.height, 0, format, GL_UNSIGNED_BYTE, img.tobytes())
-            
+    def loadReport(self) -> str:
+        """Time spent decoding the faces (summed over the parallel decodes)
+        and uploading them, so far for a streamed skybox.
+        """
+        decode, upload = TextureLoadTimes(self.textureId)
+        return "decode %.3f s, upload %.3f s" % (decode, upload)
+   
+    def __loadCubemap(self, faces: list[str], compress: bool, streamed: bool, maxSize: int) -> int:    
+        textureId = glGenTextures(1)
+
+        # faces decoded in parallel (once, then mapped from the texture cache) and uploaded in order
+        targets = [GL_TEXTURE_CUBE_MAP_POSITIVE_X + i for i in range(len(faces))]
+        LoadTextureImages(textureId, GL_TEXTURE_CUBE_MAP, targets, faces, False, False, compress, maxSize, streamed)
+
+        glBindTexture(GL_TEXTURE_CUBE_MAP, textureId)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_EDGE)
+
+        return textureId
+
+    def __uploadLighting(self) -> None:
+        lighting, self.__lighting = self.__lighting, None
+        try:
+            arrays, meta = lighting.result()
+        except Exception as e:
+            print("Could not compute the lighting of skybox '" + self.faces[0] + "':", e, file=sys.stderr)
+            return
+
+        levels = ["prefiltered" + str(level) for level in range(meta["levels"])]
+        self.irradianceId = AcquireTexture("irradiance", self.faces, lambda: self.__loadLighting(arrays, ["irradiance"]))
+        self.prefilteredId = AcquireTexture("prefiltered", self.faces, lambda: self.__loadLighting(arrays, levels))
+        self.prefilteredLevels = meta["levels"]
+
+    def __loadLighting(self, arrays: dict, names: list[str]) -> int:
+        textureId = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, textureId)
+
+        # half float RGB rows are not 4 byte aligned at the small levels
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for level, name in enumerate(names):
+            cube = arrays[name]
+            size = cube.shape[1]
+            for i in range(6):
+                glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + i, level, GL_RGB16F, size, size, 0, GL_RGB, GL_HALF_FLOAT, np.ascontiguousarray(cube[i]))
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR if len(names) > 1 else GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAX_LEVEL, len(names) - 1)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_EDGE)
+
+        return textureId
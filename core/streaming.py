@@ -0,0 +1,378 @@
+import os
+import queue
+from threading import Thread
+
+import numpy as np
+
+from OpenGL.GL import *
+import glm
+
+from PIL import Image
+
+from .cache import CacheFile, CachedBuild, HashFile, HashKey
+from .frustum import Frustum
+from .mesh import IndexType
+from .shader import ShaderProgram
+from .terrain import HeightMapTerrain, ChunkBounds, ChunkLevels, ChunkVertices, LodPatterns, SampleHeightField
+
+class TilePager:
+    def __init__(self, heights: np.ndarray, tileSize: int, chunkSize: int, budget: int, yScale: float, yShift: float):
+        """Keep the tiles closest to the camera resident within a memory budget.
+
+        Tiles are read from the (usually memory-mapped) height field and
+        split into chunks on a worker thread; the render thread only picks
+        up finished tiles, so paging never blocks a frame.
+
+        Args:
+            heights (np.ndarray): (height, width) height field, usually a np.memmap.
+            tileSize (int): Quads per tile side, a multiple of chunkSize.
+            chunkSize (int): Quads per chunk side.
+            budget (int): Maximum bytes of resident tile vertex data.
+            yScale (float): Height scale.
+            yShift (float): Height shift.
+        """
+        self.heights = heights
+        self.tileSize = tileSize
+        self.chunkSize = chunkSize
+        self.yScale = yScale
+        self.yShift = yShift
+
+        height, width = heights.shape
+        self.tileGridShape = (max(1, -(-(height-1) // tileSize)), max(1, -(-(width-1) // tileSize)))
+        self.numTiles = self.tileGridShape[0] * self.tileGridShape[1]
+
+        blockSize = chunkSize + 1
+        self.tileBytes = (tileSize // chunkSize)**2 * blockSize * blockSize * heights.itemsize
+        self.maxTiles = max(1, budget // self.tileBytes)
+
+        # tile rectangles in terrain space, for the distance to the camera
+        rows = np.arange(self.tileGridShape[0]) * tileSize
+        cols = np.arange(self.tileGridShape[1]) * tileSize
+        self.tileMins = np.stack(np.meshgrid(-height/2.0 + rows, -width/2.0 + cols, indexing="ij"), axis=-1).reshape(-1, 2)
+        self.tileMaxs = self.tileMins + tileSize
+
+        self.resident = set()
+        self.pending = set()
+        self.wanted = set()
+
+        self.requests = queue.Queue()
+        self.loaded = queue.Queue()
+        self.worker = Thread(target=self.__work, daemon=True)
+        self.worker.start()
+
+    def request(self, cameraPos: glm.vec3) -> list[int]:
+        """Ask for the tiles closest to the camera that fit in the budget.
+
+        Returns:
+            list[int]: Resident tiles that fell out of the budget and must be released.
+        """
+        camera = np.array([cameraPos.x, cameraPos.z])
+        closest = np.clip(camera[None, :], self.tileMins, self.tileMaxs)
+        distances = np.linalg.norm(closest - camera[None, :], axis=1)
+
+        order = np.argsort(distances, kind="stable")[:self.maxTiles].tolist()
+        self.wanted = set(order)
+
+        evicted = [tile for tile in self.resident if tile not in self.wanted]
+        for tile in evicted:
+            self.resident.discard(tile)
+
+        for tile in order:
+            if tile not in self.resident and tile not in self.pending:
+                self.pending.add(tile)
+                self.requests.put(tile)
+
+        return evicted
+
+    def collect(self, maxTiles: int) -> list[tuple]:
+        """Pick up to maxTiles tiles finished by the worker.
+
+        Returns:
+            list[tuple]: (tile, origin, chunk height blocks, chunk shapes, chunk
+                mins, chunk maxs) of every tile that became resident.
+        """
+        tiles = []
+        while len(tiles) < maxTiles and not self.loaded.empty():
+            result = self.loaded.get()
+            tile = result[0]
+            self.pending.discard(tile)
+
+            # the camera may have moved on while the tile was loading
+            if result[1] is not None and tile in self.wanted and tile not in self.resident:
+                self.resident.add(tile)
+                tiles.append(result)
+
+        return tiles
+
+    def close(self) -> None:
+        """Stop the worker thread.
+        """
+        self.requests.put(None)
+
+    def tileOrigin(self, tile: int) -> tuple[int,int]:
+        return (tile // self.tileGridShape[1] * self.tileSize, tile % self.tileGridShape[1] * self.tileSize)
+
+    def __work(self) -> None:
+        height, width = self.heights.shape
+
+        while True:
+            tile = self.requests.get()
+            if tile is None:
+                return
+
+            if tile not in self.wanted:
+                self.loaded.put((tile, None, None, None, None, None))
+                continue
+
+            # copying the window pages it in from disk; the shared edge row/column is read twice
+            row0, col0 = self.tileOrigin(tile)
+            window = np.array(self.heights[row0:min(row0 + self.tileSize, height-1) + 1, col0:min(col0 + self.tileSize, width-1) + 1])
+
+            blocks, shapes = ChunkVertices(window, self.chunkSize)
+            mins, maxs = ChunkBounds((height, width), blocks.reshape(shapes.shape[0] * shapes.shape[1], -1), shapes, self.chunkSize, self.yScale, self.yShift, (row0, col0))
+
+            self.loaded.put((tile, (row0, col0), blocks, shapes, mins, maxs))
+
+class StreamingTerrain:
+    MODE_STREAMING = "streaming"
+
+    TILE_SIZE = 512 # quads per tile side, a multiple of HeightMapTerrain.CHUNK_SIZE
+    MEMORY_BUDGET = 64 * 2**20 # bytes of resident tile vertex data
+    UPLOADS_PER_FRAME = 2
+
+    def __init__(self, path: str, size: tuple[int,int] = None, yScale: float = None, yShift: float = 10.0, budget: int = MEMORY_BUDGET):
+        """Terrain paged in tiles from a height field larger than memory.
+
+        Tiles use the compact vertex format of HeightMapTerrain (one height
+        per vertex) with the same chunk layout, level of detail and seam
+        stitching; draw it with heightMapTerrainCompact.vert. Tiles that
+        are not resident yet are not drawn.
+
+        Args:
+            path (str): Height field file, see HeightFieldFromFile.
+            size (tuple[int,int], optional): Width and height of raw height fields. Defaults to None.
+            yScale (float, optional): Height scale. Defaults to 64 world units over the whole value range.
+            yShift (float, optional): Height shift. Defaults to 10.0.
+            budget (int, optional): Maximum bytes of resident tiles. Defaults to MEMORY_BUDGET.
+        """
+        heights = HeightFieldFromFile(path, size)
+
+        self.size = heights.shape
+        self.yScale = yScale if yScale is not None else 64.0 / (np.iinfo(heights.dtype).max + 1)
+        self.yShift = yShift
+        self.drawCalls = 0
+        self.numTriangles = 0
+
+        chunkSize = HeightMapTerrain.CHUNK_SIZE
+        self.pager = TilePager(heights, StreamingTerrain.TILE_SIZE, chunkSize, budget, self.yScale, self.yShift)
+        self.tileChunks = StreamingTerrain.TILE_SIZE // chunkSize
+
+        # the chunk grid covers the whole height field, only resident chunks have vertex data
+        height, width = self.size
+        numRows = max(1, -(-(height-1) // chunkSize))
+        numCols = max(1, -(-(width-1) // chunkSize))
+        self.chunkGridShape = (numRows, numCols)
+        self.numChunks = numRows * numCols
+
+        shapes = np.empty((numRows, numCols, 2), dtype=np.int64)
+        shapes[:, :, 0] = np.minimum(chunkSize, height-1 - np.arange(numRows) * chunkSize)[:, None]
+        shapes[:, :, 1] = np.minimum(chunkSize, width-1 - np.arange(numCols) * chunkSize)[None, :]
+
+        # until a tile is read its chunks get boxes spanning the whole height range
+        self.chunkMins, self.chunkMaxs = ChunkBounds(self.size, np.array([[0, np.iinfo(heights.dtype).max]]).repeat(self.numChunks, axis=0), shapes, chunkSize, self.yScale, self.yShift)
+        self.chunkResident = np.zeros(self.numChunks, dtype=bool)
+        self.chunkLevels = np.zeros(self.numChunks, dtype=np.int64)
+        self.chunkMasks = np.zeros(self.numChunks, dtype=np.int64)
+        self.visibleChunks = []
+
+        blockSize = chunkSize + 1
+        self.chunkVertexCount = blockSize * blockSize
+        uniqueShapes, chunkShapes = np.unique(shapes.reshape(-1, 2), axis=0, return_inverse=True)
+        self.chunkShapes = chunkShapes.reshape(-1)
+        indices, self.patternCounts, self.patternOffsets = LodPatterns(uniqueShapes, blockSize)
+
+        self.EBO = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.indexBytes = indices.nbytes
+        self.indexType = IndexType(indices)
+
+        self.tiles = {} # tile -> (VAO, VBO, origin, chunk columns, bytes)
+
+    def cull(self, frustum: Frustum) -> None:
+        """Select the resident chunks that intersect the view frustum.
+
+        Args:
+            frustum (Frustum): Frustum of the current projection * view matrix.
+        """
+        resident = np.nonzero(self.chunkResident)[0]
+        visible = frustum.testBoxes(self.chunkMins[resident], self.chunkMaxs[resident])
+        self.visibleChunks = resident[visible].tolist()
+
+    def selectLod(self, cameraPos: glm.vec3) -> None:
+        """Page tiles in and out around the camera and pick the chunk levels.
+
+        Args:
+            cameraPos (glm.vec3): Camera position in terrain space.
+        """
+        for tile in self.pager.request(cameraPos):
+            self.__releaseTile(tile)
+
+        # cull ran before the paging, chunks of the tiles just released have no vertex data left
+        self.visibleChunks = [chunk for chunk in self.visibleChunks if self.chunkResident[chunk]]
+
+        for result in self.pager.collect(StreamingTerrain.UPLOADS_PER_FRAME):
+            self.__uploadTile(*result)
+
+        self.chunkLevels, self.chunkMasks = ChunkLevels(cameraPos, self.chunkMins, self.chunkMaxs, self.chunkGridShape)
+
+    def draw(self, shaderProgram: ShaderProgram) -> None:
+        self.drawCalls = 0
+        self.numTriangles = 0
+        if len(self.visibleChunks) == 0:
+            return
+
+        shaderProgram.setFloat("yScale", self.yScale)
+        shaderProgram.setFloat("yShift", self.yShift)
+        shaderProgram.setInt("chunkSize", HeightMapTerrain.CHUNK_SIZE)
+        shaderProgram.setInt("terrainWidth", self.size[1])
+        shaderProgram.setInt("terrainHeight", self.size[0])
+
+        chunks = np.array(self.visibleChunks)
+        rows = chunks // self.chunkGridShape[1]
+        cols = chunks % self.chunkGridShape[1]
+        tiles = (rows // self.tileChunks) * self.pager.tileGridShape[1] + cols // self.tileChunks
+        patterns = (self.chunkShapes[chunks] * HeightMapTerrain.LOD_LEVELS + self.chunkLevels[chunks]) * 16 + self.chunkMasks[chunks]
+
+        # one call per visible tile, covering all its visible chunks
+        for tile in np.unique(tiles).tolist():
+            VAO, VBO, origin, chunkCols, _ = self.tiles[tile]
+            selected = tiles == tile
+
+            localChunks = (rows[selected] % self.tileChunks) * chunkCols + cols[selected] % self.tileChunks
+            counts = self.patternCounts[patterns[selected]]
+            offsets = (ctypes.c_void_p * len(counts))(*self.patternOffsets[patterns[selected]].tolist())
+            baseVertices = (localChunks * self.chunkVertexCount).astype(np.int32)
+
+            shaderProgram.setInt("originRow", origin[0])
+            shaderProgram.setInt("originCol", origin[1])
+            shaderProgram.setInt("chunkCols", chunkCols)
+
+            glBindVertexArray(VAO)
+            glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, self.indexType, offsets, len(counts), baseVertices)
+
+            self.drawCalls += 1
+            self.numTriangles += int(counts.sum()) // 3
+
+        glBindVertexArray(0)
+
+    def sample(self, x, z) -> tuple[np.ndarray, np.ndarray]:
+        """Terrain height and normal under many points at once.
+
+        Reads the memory-mapped height field, whether or not the tiles
+        under the points are resident.
+
+        Args:
+            x: Array-like of x coordinates in terrain space.
+            z: Array-like of z coordinates in terrain space.
+
+        Returns:
+            tuple: (n,) bilinear interpolated heights and (n,3) unit normals.
+        """
+        return SampleHeightField(self.pager.heights, x, z, self.yScale, self.yShift)
+
+    def memoryReport(self) -> str:
+        """Describe the GPU memory used by the resident tiles.
+        """
+        resident = sum(tile[4] for tile in self.tiles.values())
+        report = "streaming terrain " + str(self.size[1]) + "x" + str(self.size[0]) + ": "
+        report += str(len(self.tiles)) + "/" + str(self.pager.maxTiles) + " tiles, vertices %.1f MB" % (resident / 2**20)
+        report += ", indices %.1f MB" % (self.indexBytes / 2**20)
+        return report
+
+    def close(self) -> None:
+        self.pager.close()
+        for tile in list(self.tiles.keys()):
+            self.__releaseTile(tile)
+
+    def __uploadTile(self, tile: int, origin: tuple[int,int], blocks: np.ndarray, shapes: np.ndarray, mins: np.ndarray, maxs: np.ndarray) -> None:
+        VAO = glGenVertexArrays(1)
+        VBO = glGenBuffers(1)
+
+        glBindVertexArray(VAO)
+        glBindBuffer(GL_ARRAY_BUFFER, VBO)
+        glBufferData(GL_ARRAY_BUFFER, blocks.nbytes, blocks, GL_STATIC_DRAW)
+
+        type = GL_UNSIGNED_SHORT if blocks.dtype == np.uint16 else GL_UNSIGNED_BYTE
+        glVertexAttribPointer(0, 1, type, GL_FALSE, blocks.itemsize, None)
+        glEnableVertexAttribArray(0)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+        glBindVertexArray(0)
+
+        self.tiles[tile] = (VAO, VBO, origin, shapes.shape[1], blocks.nbytes)
+
+        # the tile's real boxes replace the conservative ones
+        chunks = self.__tileChunks(origin, shapes.shape[:2])
+        self.chunkMins[chunks] = mins
+        self.chunkMaxs[chunks] = maxs
+        self.chunkResident[chunks] = True
+
+    def __releaseTile(self, tile: int) -> None:
+        if tile not in self.tiles:
+            return
+
+        VAO, VBO, origin, chunkCols, _ = self.tiles.pop(tile)
+        glDeleteVertexArrays(1, [VAO])
+        glDeleteBuffers(1, [VBO])
+
+        chunkRows = min(self.tileChunks, self.chunkGridShape[0] - origin[0] // HeightMapTerrain.CHUNK_SIZE)
+        self.chunkResident[self.__tileChunks(origin, (chunkRows, chunkCols))] = False
+
+    def __tileChunks(self, origin: tuple[int,int], shape: tuple[int,int]) -> np.ndarray:
+        row0 = origin[0] // HeightMapTerrain.CHUNK_SIZE
+        col0 = origin[1] // HeightMapTerrain.CHUNK_SIZE
+        rows = row0 + np.arange(shape[0])
+        cols = col0 + np.arange(shape[1])
+        return (rows[:, None] * self.chunkGridShape[1] + cols[None, :]).reshape(-1)
+
+def HeightFieldFromFile(path: str, size: tuple[int,int] = None) -> np.ndarray:
+    """Open a height field as a read-only memory-mapped (height, width) array.
+
+    Raw files (.raw/.r16) hold little-endian 16 bit heights, row by row;
+    their size is given as (width, height) or they are assumed square.
+    .npy files are mapped as they are. Images (16 bit grayscale, 8 bit
+    grayscale or the red channel of RGB/RGBA) are decoded once and kept
+    as a mappable copy in the cache directory.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in (".raw", ".r16"):
+        count = os.path.getsize(path) // 2
+        if size is None:
+            side = int(round(count ** 0.5))
+            if side * side != count:
+                raise ValueError("Raw height field '" + path + "' is not square, its size must be given!")
+            size = (side, side)
+        return np.memmap(path, dtype="<u2", mode="r", shape=(size[1], size[0]))
+
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+
+    def decode() -> tuple[dict, dict]:
+        with Image.open(path) as img:
+            if img.mode in ["I;16", "I;16L", "I;16B"]:
+                heights = np.asarray(img).astype(np.uint16)
+            elif img.mode == "L":
+                heights = np.asarray(img)
+            elif img.mode in ["RGB", "RGBA"]:
+                heights = np.asarray(img)[:, :, 0]
+            else:
+                message = "StreamingTerrain does not support '" + img.mode + "' type!"
+                raise ValueError(message)
+
+        return {"heights": np.ascontiguousarray(heights)}, {}
+
+    cacheFile = CacheFile("heightfields", path, HashKey(HashFile(path)))
+    return CachedBuild(cacheFile, decode)[0]["heights"]
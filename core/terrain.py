@@ -5,74 +5,552 @@ import glm
 
 from PIL import Image
 
+from .cache import CacheFile, CachedBuild, HashFile, HashKey
+from .frustum import Frustum
+from .mesh import IndexArray, IndexType
 from .shader import ShaderProgram
 
 class HeightMapTerrain:
-    def __init__(self, path: str):
+    CHUNK_SIZE = 64 # quads per chunk side
+    LOD_LEVELS = 4 # strides rez, 2*rez, 4*rez and 8*rez
+    LOD_DISTANCE = 96.0 # distance at which chunks switch to the second level
+
+    # edges of a chunk, in local block coordinates
+    EDGE_TOP = 1 # first row
+    EDGE_BOTTOM = 2 # last row
+    EDGE_LEFT = 4 # first column
+    EDGE_RIGHT = 8 # last column
+
+    CACHE_VERSION = 2 # bump when the cached layout changes
+
+    # where the vertices come from
+    MODE_MESH = "mesh" # full x,y,z vertex buffer built on the CPU
+    MODE_TEXTURE = "texture" # heightmap texture sampled by the vertex shader
+    MODE_COMPACT = "compact" # one 8/16 bit height per vertex, x and z rebuilt by the vertex shader
+
+    def __init__(self, path: str, mode: str = MODE_MESH):
+        if mode not in (HeightMapTerrain.MODE_MESH, HeightMapTerrain.MODE_TEXTURE, HeightMapTerrain.MODE_COMPACT):
+            raise ValueError("Invalid terrain mode: '" + str(mode) + "'")
+
+        self.mode = mode
+        self.drawCalls = 0
+        self.numTriangles = 0
+        self.visibleChunks = []
+        self.memory = {"vertices": 0, "indices": 0, "texture": 0}
         self.__loadHeightMap(path)
 
+    def cull(self, frustum: Frustum) -> None:
+        """Select the chunks that intersect the view frustum.
+
+        Args:
+            frustum (Frustum): Frustum of the current projection * view matrix.
+        """
+        self.visibleChunks = self.quadTree.query(frustum)
+
+    def selectLod(self, cameraPos: glm.vec3) -> None:
+        """Pick the level of detail of every chunk from its distance to the camera.
+
+        Neighbouring chunks are kept at most one level apart, and the finer
+        side of every seam is stitched to the coarser one.
+
+        Args:
+            cameraPos (glm.vec3): Camera position in terrain space.
+        """
+        self.chunkLevels, self.chunkMasks = ChunkLevels(cameraPos, self.chunkMins, self.chunkMaxs, self.chunkGridShape)
+
     def draw(self, shaderProgram: ShaderProgram) -> None:
+        self.drawCalls = 0
+        self.numTriangles = 0
+        if len(self.visibleChunks) == 0:
+            return
+
+        chunks = np.array(self.visibleChunks)
+        patterns = (self.chunkShapes[chunks] * HeightMapTerrain.LOD_LEVELS + self.chunkLevels[chunks]) * 16 + self.chunkMasks[chunks]
+
+        counts = self.patternCounts[patterns]
+        offsets = (ctypes.c_void_p * len(chunks))(*self.patternOffsets[patterns].tolist())
+        baseVertices = (chunks * self.chunkVertexCount).astype(np.int32)
+
+        if self.mode == HeightMapTerrain.MODE_TEXTURE:
+            glActiveTexture(GL_TEXTURE0)
+            glBindTexture(GL_TEXTURE_2D, self.heightMapId)
+            shaderProgram.setInt("heightMap", 0)
+            shaderProgram.setFloat("heightMax", self.heightMax)
+            shaderProgram.setFloat("yScale", self.yScale)
+            shaderProgram.setFloat("yShift", self.yShift)
+            shaderProgram.setInt("chunkSize", HeightMapTerrain.CHUNK_SIZE)
+            shaderProgram.setInt("chunkCols", self.chunkGridShape[1])
+
+        elif self.mode == HeightMapTerrain.MODE_COMPACT:
+            shaderProgram.setFloat("yScale", self.yScale)
+            shaderProgram.setFloat("yShift", self.yShift)
+            shaderProgram.setInt("chunkSize", HeightMapTerrain.CHUNK_SIZE)
+            shaderProgram.setInt("chunkCols", self.chunkGridShape[1])
+            shaderProgram.setInt("terrainWidth", self.size[1])
+            shaderProgram.setInt("terrainHeight", self.size[0])
+            shaderProgram.setInt("originRow", 0)
+            shaderProgram.setInt("originCol", 0)
+
+        # the base vertex moves the shared pattern onto each chunk, so all visible chunks go in a single call
         glBindVertexArray(self.terrainVAO)
-        for strip in range(self.numStrips):
-            glDrawElements(GL_TRIANGLE_STRIP,
-                           self.numTrisPerStrip+2,
-                           GL_UNSIGNED_INT,
-                           ctypes.c_void_p(4 * (self.numTrisPerStrip+2) * strip)
-                        )
+        glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, self.indexType, offsets, len(chunks), baseVertices)
         glBindVertexArray(0)
-    
-    def __loadHeightMap(self,path :str) -> None:
-        vertices = []
-        indices = []
 
-        yScale = 64.0 / 256.0
-        yShift = 10.0
+        if self.mode == HeightMapTerrain.MODE_TEXTURE:
+            glBindTexture(GL_TEXTURE_2D, 0)
+
+        self.drawCalls = 1
+        self.numTriangles = int(counts.sum()) // 3
+
+    def sample(self, x, z) -> tuple[np.ndarray, np.ndarray]:
+        """Terrain height and normal under many points at once.
+
+        Reads the retained height field, never the GPU buffers. Points
+        outside the terrain are clamped to its border.
+
+        Args:
+            x: Array-like of x coordinates in terrain space.
+            z: Array-like of z coordinates in terrain space.
+
+        Returns:
+            tuple: (n,) bilinear interpolated heights and (n,3) unit normals.
+        """
+        return SampleHeightField(self.heights, x, z, self.yScale, self.yShift)
+
+    def memoryReport(self) -> str:
+        """Describe the GPU memory used by the terrain buffers.
+        """
+        total = sum(self.memory.values())
+        report = self.mode + " terrain " + str(self.size[1]) + "x" + str(self.size[0]) + ": "
+        report += ", ".join(name + " %.1f MB" % (size / 2**20) for name, size in self.memory.items())
+        report += " (total %.1f MB)" % (total / 2**20)
+        return report
+
+    def __loadHeightMap(self,path :str) -> None:
+        self.yScale = 64.0 / 256.0
+        self.yShift = 10.0
         rez = 1
-        
-        with Image.open(path) as img:
-            bytesPerPixel = len(img.getbands())
-            height = img.height
-            width = img.width
-
-            for i in range(height):
-               for j in range(width):
-                    texel = img.getpixel((j,i))
-                    if img.mode in ["RGB", "RGBA"]:
-                        y = texel[0]
-                    else:
-                        message = "HeightMapTerrain does not support '" + img.mode + "' type!"
-                        raise ValueError(message)
-                    
-
-                    vx = -height/2.0 + i
-                    vy = y * yScale - yShift
-                    vz = -width/2.0 + j
-
-                    vertices.extend([vx,vy,vz])
-        
-        for i in range(0, height-1, rez): 
-            for j in range(0, width, rez):
-                for k in range(2):
-                    indices.append(j + width * (i + k*rez))
-                    
-        self.numStrips = int((height-1)/rez)
-        self.numTrisPerStrip = int((width/rez)*2)-2
-        
-        vertices = glm.array(np.array(vertices, dtype=np.float32))
-        indices = glm.array(np.array(indices, dtype=np.uint32))
-        
+
+        # a warm start maps the built buffers from disk and uploads them as they are
+        key = HashKey(HashFile(path), self.mode, self.yScale, self.yShift, rez, HeightMapTerrain.CHUNK_SIZE, HeightMapTerrain.LOD_LEVELS, HeightMapTerrain.CACHE_VERSION)
+        cacheFile = CacheFile("terrains", path + "." + self.mode, key)
+
+        self.__setupHeightMap(*CachedBuild(cacheFile, lambda: self.__buildHeightMap(path, rez)))
+
+    def __buildHeightMap(self, path: str, rez: int) -> tuple[dict, dict]:
+        heights = HeightsFromFile(path)
+        blocks, shapes = ChunkVertices(heights, HeightMapTerrain.CHUNK_SIZE)
+
+        # chunks of the same size share their index patterns, the base vertex moves them to the chunk
+        blockSize = HeightMapTerrain.CHUNK_SIZE + 1
+        uniqueShapes, chunkShapes = np.unique(shapes.reshape(-1, 2), axis=0, return_inverse=True)
+
+        indices, patternCounts, patternOffsets = LodPatterns(uniqueShapes, blockSize, rez)
+
+        numChunks = shapes.shape[0] * shapes.shape[1]
+        chunkMins, chunkMaxs = ChunkBounds(heights.shape, blocks.reshape(numChunks, -1), shapes, HeightMapTerrain.CHUNK_SIZE, self.yScale, self.yShift)
+
+        arrays = {
+            "heights": heights,
+            "vertices": TerrainVertices(heights, self.mode, self.yScale, self.yShift, HeightMapTerrain.CHUNK_SIZE),
+            "indices": indices,
+            "patternCounts": patternCounts,
+            "patternOffsets": patternOffsets,
+            "chunkShapes": chunkShapes.reshape(-1),
+            "chunkMins": chunkMins,
+            "chunkMaxs": chunkMaxs,
+        }
+        meta = {"chunkGridShape": list(shapes.shape[:2])}
+
+        return arrays, meta
+
+    def __setupHeightMap(self, arrays: dict, meta: dict) -> None:
+        heights = arrays["heights"]
+        vertices = arrays["vertices"]
+        indices = arrays["indices"]
+
+        self.size = heights.shape
+        self.heightMax = float(np.iinfo(heights.dtype).max)
+
+        # kept (memory-mapped when cached) for height queries
+        self.heights = heights
+
+        self.patternCounts = np.asarray(arrays["patternCounts"])
+        self.patternOffsets = np.asarray(arrays["patternOffsets"])
+        self.chunkShapes = np.asarray(arrays["chunkShapes"])
+        self.chunkMins = np.asarray(arrays["chunkMins"])
+        self.chunkMaxs = np.asarray(arrays["chunkMaxs"])
+
+        blockSize = HeightMapTerrain.CHUNK_SIZE + 1
+        self.chunkVertexCount = blockSize * blockSize
+        self.chunkGridShape = tuple(meta["chunkGridShape"])
+        self.numChunks = self.chunkGridShape[0] * self.chunkGridShape[1]
+        self.chunkLevels = np.zeros(self.numChunks, dtype=np.int64)
+        self.chunkMasks = np.zeros(self.numChunks, dtype=np.int64)
+
+        self.quadTree = QuadTree(self.chunkMins, self.chunkMaxs, *self.chunkGridShape)
+        self.visibleChunks = list(range(self.numChunks))
+
         self.terrainVAO = glGenVertexArrays(1)
-        self.terrainVBO = glGenBuffers(1)                 
         self.terrainEBO = glGenBuffers(1)
-        
+
         glBindVertexArray(self.terrainVAO)
-        glBindBuffer(GL_ARRAY_BUFFER, self.terrainVBO)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices.ptr, GL_STATIC_DRAW)
 
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * glm.sizeof(glm.float32), None)
-        glEnableVertexAttribArray(0)
-        
+        if self.mode == HeightMapTerrain.MODE_TEXTURE:
+            # no vertex buffer: the shader rebuilds every vertex from gl_VertexID and the heightmap
+            self.heightMapId = HeightTextureFromArray(heights)
+            self.memory["texture"] = heights.nbytes
+
+        else:
+            self.terrainVBO = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.terrainVBO)
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+            self.memory["vertices"] = vertices.nbytes
+
+            if self.mode == HeightMapTerrain.MODE_MESH:
+                glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * glm.sizeof(glm.float32), None)
+            else:
+                # raw integer heights, converted to float (not normalized) and scaled in the shader
+                type = GL_UNSIGNED_SHORT if vertices.dtype == np.uint16 else GL_UNSIGNED_BYTE
+                glVertexAttribPointer(0, 1, type, GL_FALSE, vertices.itemsize, None)
+            glEnableVertexAttribArray(0)
+
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.terrainEBO)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices.ptr, GL_STATIC_DRAW)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        self.memory["indices"] = indices.nbytes
+        self.indexType = IndexType(indices)
 
         glBindVertexArray(0)
+
+class QuadTree:
+    def __init__(self, boxMins: np.ndarray, boxMaxs: np.ndarray, numRows: int, numCols: int):
+        """Quadtree over a row-major grid of chunk bounding boxes.
+
+        Args:
+            boxMins (np.ndarray): (numRows*numCols, 3) minimum corners.
+            boxMaxs (np.ndarray): (numRows*numCols, 3) maximum corners.
+            numRows (int): Number of chunk rows.
+            numCols (int): Number of chunk columns.
+        """
+        self.numCols = numCols
+        self.root = self.__build(boxMins, boxMaxs, 0, numRows, 0, numCols)
+
+    def query(self, frustum: Frustum) -> list[int]:
+        """Return the ids of the chunks that are not outside the frustum.
+        """
+        visible = []
+        self.__collect(self.root, frustum, visible)
+        return visible
+
+    def __build(self, boxMins, boxMaxs, row0: int, row1: int, col0: int, col1: int) -> tuple:
+        ids = [r * self.numCols + c for r in range(row0, row1) for c in range(col0, col1)]
+        boxMin = boxMins[ids].min(axis=0).tolist()
+        boxMax = boxMaxs[ids].max(axis=0).tolist()
+
+        children = []
+        if row1 - row0 > 1 or col1 - col0 > 1:
+            rowMid = (row0 + row1 + 1) // 2
+            colMid = (col0 + col1 + 1) // 2
+            for r0, r1 in ((row0, rowMid), (rowMid, row1)):
+                for c0, c1 in ((col0, colMid), (colMid, col1)):
+                    if r0 < r1 and c0 < c1:
+                        children.append(self.__build(boxMins, boxMaxs, r0, r1, c0, c1))
+
+        return (boxMin, boxMax, ids, children)
+
+    def __collect(self, node: tuple, frustum: Frustum, visible: list[int]) -> None:
+        boxMin, boxMax, ids, children = node
+
+        result = frustum.testBox(boxMin, boxMax)
+        if result == Frustum.OUTSIDE:
+            return
+
+        # a node entirely inside the frustum needs no further tests
+        if result == Frustum.INSIDE or len(children) == 0:
+            visible.extend(ids)
+            return
+
+        for child in children:
+            self.__collect(child, frustum, visible)
+
+def HeightsFromFile(path: str) -> np.ndarray:
+    """Read the height field of an image as a (height, width) array.
+
+    Only the red channel of RGB/RGBA images is used, the same as the
+    per-texel loader did.
+    """
+    with Image.open(path) as img:
+        if img.mode not in ["RGB", "RGBA"]:
+            message = "HeightMapTerrain does not support '" + img.mode + "' type!"
+            raise ValueError(message)
+
+        # view the decoded image buffer directly instead of calling getpixel per texel
+        return np.asarray(img)[:, :, 0].copy()
+
+def VerticesFromHeights(heights: np.ndarray, yScale: float, yShift: float) -> np.ndarray:
+    """Build the (height, width, 3) float32 vertex grid of a height field.
+    """
+    height, width = heights.shape
+
+    # compute in double precision and cast once, so values match the float32
+    # conversion of the python floats produced by the old loop
+    vertices = np.empty((height, width, 3), dtype=np.float32)
+    vertices[:, :, 0] = (-height/2.0 + np.arange(height))[:, None]
+    vertices[:, :, 1] = heights * yScale - yShift
+    vertices[:, :, 2] = (-width/2.0 + np.arange(width))[None, :]
+
+    return vertices
+
+def ChunkVertices(grid: np.ndarray, chunkSize: int) -> tuple[np.ndarray, np.ndarray]:
+    """Split a vertex (or height) grid into fixed size chunks stored one after the other.
+
+    Every chunk owns a (chunkSize+1)^2 block of vertices, so neighbouring
+    chunks duplicate their shared edge. Chunks on the far borders are padded
+    by repeating the last row/column.
+
+    Returns:
+        tuple: the chunk-major vertex array and the (chunkRows, chunkCols, 2)
+            array with the number of quad rows and columns of every chunk.
+    """
+    height, width = grid.shape[:2]
+    numRows = max(1, -(-(height-1) // chunkSize))
+    numCols = max(1, -(-(width-1) // chunkSize))
+
+    local = np.arange(chunkSize + 1)
+    rows = np.minimum(np.arange(numRows)[:, None] * chunkSize + local[None, :], height-1)
+    cols = np.minimum(np.arange(numCols)[:, None] * chunkSize + local[None, :], width-1)
+
+    vertices = grid[rows[:, None, :, None], cols[None, :, None, :]]
+
+    shapes = np.empty((numRows, numCols, 2), dtype=np.int64)
+    shapes[:, :, 0] = (rows[:, -1] - rows[:, 0])[:, None]
+    shapes[:, :, 1] = (cols[:, -1] - cols[:, 0])[None, :]
+
+    return np.ascontiguousarray(vertices).reshape(-1), shapes
+
+def ChunkLevels(cameraPos: glm.vec3, chunkMins: np.ndarray, chunkMaxs: np.ndarray, gridShape: tuple[int,int]) -> tuple[np.ndarray, np.ndarray]:
+    """Level of detail and stitched edges of every chunk of a grid.
+
+    The level grows by one every time the distance from the camera to the
+    chunk box doubles past HeightMapTerrain.LOD_DISTANCE. Neighbouring
+    chunks are kept at most one level apart, so a seam only needs to skip
+    every other vertex.
+
+    Returns:
+        tuple: (numChunks,) levels and HeightMapTerrain.EDGE_* masks of the
+            edges shared with a coarser neighbour.
+    """
+    # distance from the camera to the closest point of every chunk box
+    camera = np.array([cameraPos.x, cameraPos.y, cameraPos.z])
+    closest = np.clip(camera[None, :], chunkMins, chunkMaxs)
+    distances = np.linalg.norm(closest - camera[None, :], axis=1)
+
+    levels = np.floor(np.log2(np.maximum(distances, 1e-6) / HeightMapTerrain.LOD_DISTANCE)) + 1
+    levels = np.clip(levels, 0, HeightMapTerrain.LOD_LEVELS-1).astype(np.int64)
+    levels = levels.reshape(gridShape)
+
+    for _ in range(HeightMapTerrain.LOD_LEVELS-1):
+        padded = np.pad(levels, 1, constant_values=HeightMapTerrain.LOD_LEVELS)
+        neighbours = np.minimum.reduce([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+        levels = np.minimum(levels, neighbours + 1)
+
+    padded = np.pad(levels, 1, constant_values=-1)
+    masks = np.zeros_like(levels)
+    masks |= np.where(padded[:-2, 1:-1] > levels, HeightMapTerrain.EDGE_TOP, 0)
+    masks |= np.where(padded[2:, 1:-1] > levels, HeightMapTerrain.EDGE_BOTTOM, 0)
+    masks |= np.where(padded[1:-1, :-2] > levels, HeightMapTerrain.EDGE_LEFT, 0)
+    masks |= np.where(padded[1:-1, 2:] > levels, HeightMapTerrain.EDGE_RIGHT, 0)
+
+    return levels.reshape(-1), masks.reshape(-1)
+
+def TerrainVertices(heights: np.ndarray, mode: str, yScale: float, yShift: float, chunkSize: int) -> np.ndarray:
+    """Chunk-major vertex buffer contents of a terrain mode.
+
+    MODE_MESH stores float32 x,y,z per vertex, MODE_COMPACT only the raw
+    height with the height field's own integer type. MODE_TEXTURE has no
+    vertex buffer and returns an empty array.
+    """
+    if mode == HeightMapTerrain.MODE_MESH:
+        return ChunkVertices(VerticesFromHeights(heights, yScale, yShift), chunkSize)[0]
+
+    if mode == HeightMapTerrain.MODE_COMPACT:
+        return ChunkVertices(heights, chunkSize)[0]
+
+    return np.empty(0, dtype=heights.dtype)
+
+def ChunkBounds(size: tuple[int,int], heightBlocks: np.ndarray, shapes: np.ndarray, chunkSize: int, yScale: float, yShift: float, origin: tuple[int,int] = (0,0)) -> tuple[np.ndarray, np.ndarray]:
+    """Axis aligned bounding boxes of the chunks of a height field.
+
+    Args:
+        size (tuple[int,int]): Height and width of the height field.
+        heightBlocks (np.ndarray): (numChunks, blockSize^2) chunked heights, see ChunkVertices.
+        shapes (np.ndarray): (chunkRows, chunkCols, 2) quad rows and columns of every chunk.
+        chunkSize (int): Quads per chunk side.
+        yScale (float): Height scale.
+        yShift (float): Height shift.
+        origin (tuple[int,int], optional): Row and column of the first chunk,
+            when the blocks only cover a window of the height field. Defaults to (0,0).
+
+    Returns:
+        tuple: (numChunks, 3) minimum and maximum corners.
+    """
+    height, width = size
+    numRows, numCols = shapes.shape[:2]
+
+    row0 = np.repeat(origin[0] + np.arange(numRows) * chunkSize, numCols)
+    col0 = np.tile(origin[1] + np.arange(numCols) * chunkSize, numRows)
+    rows = shapes[:, :, 0].reshape(-1)
+    cols = shapes[:, :, 1].reshape(-1)
+
+    mins = np.empty((len(row0), 3), dtype=np.float32)
+    maxs = np.empty((len(row0), 3), dtype=np.float32)
+    mins[:, 0] = -height/2.0 + row0
+    maxs[:, 0] = -height/2.0 + row0 + rows
+    mins[:, 1] = heightBlocks.min(axis=1) * yScale - yShift
+    maxs[:, 1] = heightBlocks.max(axis=1) * yScale - yShift
+    mins[:, 2] = -width/2.0 + col0
+    maxs[:, 2] = -width/2.0 + col0 + cols
+
+    return mins, maxs
+
+def SampleHeightField(heights: np.ndarray, x, z, yScale: float, yShift: float) -> tuple[np.ndarray, np.ndarray]:
+    """Bilinear height and normal of a height field at terrain space points.
+
+    Row i of the field lies at x = -height/2 + i and column j at
+    z = -width/2 + j, the same layout the terrain vertices use.
+
+    Returns:
+        tuple: (n,) heights and (n,3) unit normals.
+    """
+    height, width = heights.shape
+
+    rows = np.clip(np.asarray(x, dtype=np.float64).reshape(-1) + height/2.0, 0, height-1)
+    cols = np.clip(np.asarray(z, dtype=np.float64).reshape(-1) + width/2.0, 0, width-1)
+
+    row0 = np.minimum(rows.astype(np.int64), max(height-2, 0))
+    col0 = np.minimum(cols.astype(np.int64), max(width-2, 0))
+    row1 = np.minimum(row0 + 1, height-1)
+    col1 = np.minimum(col0 + 1, width-1)
+    fr = rows - row0
+    fc = cols - col0
+
+    # only the texels under the points are read, so memory-mapped fields stay mostly on disk
+    h00 = heights[row0, col0] * yScale - yShift
+    h01 = heights[row0, col1] * yScale - yShift
+    h10 = heights[row1, col0] * yScale - yShift
+    h11 = heights[row1, col1] * yScale - yShift
+
+    values = (1-fr)*(1-fc)*h00 + (1-fr)*fc*h01 + fr*(1-fc)*h10 + fr*fc*h11
+
+    # gradient of the bilinear patch, one world unit per texel
+    dx = (1-fc)*(h10-h00) + fc*(h11-h01)
+    dz = (1-fr)*(h01-h00) + fr*(h11-h10)
+    normals = np.stack([-dx, np.ones_like(dx), -dz], axis=1)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    return values, normals
+
+def HeightTextureFromArray(heights: np.ndarray) -> int:
+    """Upload a height field as a single channel texture.
+
+    8 bit heights become a GL_R8 texture and 16 bit heights a GL_R16 one.
+    """
+    internalFormat, type = (GL_R16, GL_UNSIGNED_SHORT) if heights.dtype == np.uint16 else (GL_R8, GL_UNSIGNED_BYTE)
+
+    textureId = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureId)
+
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, internalFormat, heights.shape[1], heights.shape[0], 0, GL_RED, type, np.ascontiguousarray(heights))
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+    # heights are read with texelFetch, so no filtering or mipmaps are needed
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+
+    glBindTexture(GL_TEXTURE_2D, 0)
+
+    return textureId
+
+def LodPatterns(shapes: np.ndarray, rowStride: int, rez: int = 1) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Index patterns of every chunk shape, level and combination of stitched edges.
+
+    Pattern (shape * HeightMapTerrain.LOD_LEVELS + level) * 16 + edges starts
+    at the returned byte offset.
+
+    Args:
+        shapes (np.ndarray): (n,2) distinct quad rows and columns of the chunks.
+        rowStride (int): Number of vertices between two rows of a chunk block.
+        rez (int, optional): Stride of the finest level. Defaults to 1.
+
+    Returns:
+        tuple: concatenated indices (uint16 when a chunk block has at most
+            65536 vertices, as with the default chunk size), index count and
+            byte offset of every pattern.
+    """
+    indices = []
+    numVertices = (int(np.max(shapes[:, 0], initial=0)) + 1) * rowStride
+    numPatterns = len(shapes) * HeightMapTerrain.LOD_LEVELS * 16
+    counts = np.zeros(numPatterns, dtype=np.int32)
+    offsets = np.zeros(numPatterns, dtype=np.int64)
+    offset = 0
+    for shape, (rows, cols) in enumerate(shapes):
+        for level in range(HeightMapTerrain.LOD_LEVELS):
+            for mask in range(16):
+                pattern = IndexArray(LodPattern(rows, cols, rowStride, rez * 2**level, mask), numVertices)
+                i = (shape * HeightMapTerrain.LOD_LEVELS + level) * 16 + mask
+                counts[i] = len(pattern)
+                offsets[i] = offset * pattern.itemsize
+                offset += len(pattern)
+                indices.append(pattern)
+
+    return np.concatenate(indices), counts, offsets
+
+def LodPattern(rows: int, cols: int, rowStride: int, stride: int, stitchedEdges: int = 0) -> np.ndarray:
+    """Triangle indices of a rows x cols quad block sampled every stride vertices.
+
+    Vertices on a stitched edge are snapped down to the grid of the next
+    coarser level (twice the stride), so the edge matches a coarser
+    neighbour exactly; triangles collapsed by the snapping are dropped.
+
+    Args:
+        rows (int): Number of quad rows.
+        cols (int): Number of quad columns.
+        rowStride (int): Number of vertices between two rows of the block.
+        stride (int): Sampling stride of this level.
+        stitchedEdges (int, optional): HeightMapTerrain.EDGE_* flags of the edges
+            next to a coarser chunk. Defaults to 0.
+    """
+    # the last row/column is always kept, so blocks of any size are closed
+    sampledRows = np.unique(np.append(np.arange(0, rows, stride), rows))
+    sampledCols = np.unique(np.append(np.arange(0, cols, stride), cols))
+
+    r, c = np.meshgrid(sampledRows, sampledCols, indexing="ij")
+
+    coarse = 2 * stride
+    snapRows = lambda v: np.where(v == rows, v, v // coarse * coarse)
+    snapCols = lambda v: np.where(v == cols, v, v // coarse * coarse)
+    if stitchedEdges & HeightMapTerrain.EDGE_TOP:
+        c = np.where(r == 0, snapCols(c), c)
+    if stitchedEdges & HeightMapTerrain.EDGE_BOTTOM:
+        c = np.where(r == rows, snapCols(c), c)
+    if stitchedEdges & HeightMapTerrain.EDGE_LEFT:
+        r = np.where(c == 0, snapRows(r), r)
+    if stitchedEdges & HeightMapTerrain.EDGE_RIGHT:
+        r = np.where(c == cols, snapRows(r), r)
+
+    grid = r * rowStride + c
+    v00 = grid[:-1, :-1].reshape(-1)
+    v01 = grid[:-1, 1:].reshape(-1)
+    v10 = grid[1:, :-1].reshape(-1)
+    v11 = grid[1:, 1:].reshape(-1)
+
+    triangles = np.concatenate([
+        np.stack([v00, v10, v01], axis=1),
+        np.stack([v01, v10, v11], axis=1),
+    ])
+    degenerate = (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | (triangles[:, 0] == triangles[:, 2])
+
+    return triangles[~degenerate].astype(np.uint32).reshape(-1)
@@ -0,0 +1,516 @@
+import ctypes
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import *
+from OpenGL.raw.GL.VERSION.GL_1_3 import glGetCompressedTexImage as RawGetCompressedTexImage
+
+from PIL import Image
+
+from .cache import CacheFile, CachedBuild, HashFile, HashKey, ReadCache
+
+TEXTURE_CACHE_VERSION = 1 # bump when the compiled layout changes
+IMAGE_WORKERS = min(8, os.cpu_count() or 2) # threads decoding images and staging queued uploads
+UPLOAD_BUDGET = 32 << 20 # bytes handed to the driver per ProcessTextureUploads call
+
+# content key -> [texture id, references], shared by every asset of the process
+_textures = {}
+# texture id -> content key
+_keys = {}
+# (absolute path, size, modification time) -> content hash, so a file is hashed once
+_hashes = {}
+# queued uploads, oldest first, see QueueTextureUpload
+_uploads = deque()
+# pixel unpack buffers free for the next upload
+_stagingBuffers = []
+# texture id -> [decode seconds, upload seconds], see TextureLoadTimes
+_loadTimes = {}
+_workers = None
+
+@dataclass
+class _Upload:
+    textureId: int
+    bindTarget: int
+    target: int
+    image: tuple # CompiledImage arguments
+    layer: int # array layer, None for 2D and cubemap targets
+    load: object # future of the timed PrepareImage
+    copy: object = None # future of the copy into the staging buffer
+    compiled: tuple = None
+    offsets: list = None
+    buffer: int = 0
+    fence: object = None
+    cancelled: bool = False
+
+def AcquireTexture(kind: str, paths: list[str], loader) -> int:
+    """GL texture of one or more image files, shared by everything that
+    loads the same contents.
+
+    Textures are keyed by kind and the content hash of their files, so the
+    same file under other paths, or a byte-identical copy, is uploaded once.
+
+    Args:
+        kind (str): Texture kind, e.g. "2d" or "cubemap".
+        paths (list[str]): Source files.
+        loader: Called without arguments on a miss, returns the new texture id.
+
+    Returns:
+        int: Texture id, to be given back with ReleaseTexture.
+    """
+    key = (kind,) + tuple(ContentHash(path) for path in paths)
+
+    entry = _textures.get(key)
+    if entry is None:
+        entry = [loader(), 0]
+        _textures[key] = entry
+        _keys[entry[0]] = key
+
+    entry[1] += 1
+    return entry[0]
+
+def ReleaseTexture(textureId: int) -> None:
+    """Drop a reference taken by AcquireTexture, deleting the texture with
+    the last one.
+    """
+    key = _keys.get(textureId)
+    if key is None:
+        return
+
+    entry = _textures[key]
+    entry[1] -= 1
+    if entry[1] == 0:
+        for upload in _uploads:
+            if upload.textureId == textureId:
+                upload.cancelled = True
+        glDeleteTextures(1, [textureId])
+        _loadTimes.pop(textureId, None)
+        del _textures[key]
+        del _keys[textureId]
+
+def TextureStats() -> tuple[int, int]:
+    """Number of shared textures and of references to them.
+    """
+    return len(_textures), sum(references for _, references in _textures.values())
+
+def TextureLoadTimes(textureId: int) -> tuple[float, float]:
+    """Seconds spent decoding (or compiling) and uploading the images of a
+    texture loaded by LoadTextureImages. Decoding is summed over the
+    images, which are decoded in parallel, so it can exceed the wall time.
+    """
+    return tuple(_loadTimes.get(textureId, (0.0, 0.0)))
+
+def ContentHash(path: str) -> str:
+    """Content hash of a file, remembered by resolved path, size and
+    modification time.
+    """
+    path = os.path.realpath(path)
+    status = os.stat(path)
+    key = (path, status.st_size, status.st_mtime_ns)
+
+    digest = _hashes.get(key)
+    if digest is None:
+        digest = HashFile(path)
+        _hashes[key] = digest
+
+    return digest
+
+def CompiledImage(path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0, prepared: tuple = None) -> tuple[dict, dict]:
+    """Decoded (and compressed) mip chain of an image file, compiled on the
+    first use and then memory-mapped from the texture cache.
+
+    Args:
+        path (str): Image file.
+        flip (bool): Flip vertically, for OpenGL's bottom-up rows.
+        mipmaps (bool): Build the full mip chain, otherwise only level 0.
+        compress (bool): Store the levels in a GPU-compressed format when
+            the driver supports one for the image's channels.
+        maxSize (int): Downscale images larger than this on either side,
+            keeping the aspect ratio. 0 keeps the full resolution.
+        prepared (tuple): PrepareImage result of the same image, finished
+            here instead of starting over.
+
+    Returns:
+        tuple: "level0", "level1", ... uint8 arrays and the metadata (width,
+            height, components, levels, internal format and whether the
+            levels are compressed), ready for UploadImage.
+    """
+    compiled, decoded = prepared or (None, None)
+    if compiled is not None:
+        return compiled
+    return CachedBuild(ImageCacheFile(path, flip, mipmaps, compress, maxSize), lambda: CompileImage(path, flip, mipmaps, compress, maxSize, decoded))
+
+def PrepareImage(path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0) -> tuple:
+    """The part of CompiledImage that needs no GL context, safe on worker
+    threads (PIL releases the GIL while decoding and resizing).
+
+    Returns:
+        tuple: (compiled image, None) when it is cached or could be compiled
+            here, otherwise (None, DecodeImage result) to be compressed by
+            CompiledImage on the GL thread.
+    """
+    cached = ReadCache(ImageCacheFile(path, flip, mipmaps, compress, maxSize))
+    if cached is not None:
+        return cached, None
+    if compress:
+        return None, DecodeImage(path, flip, mipmaps, maxSize)
+    return CompiledImage(path, flip, mipmaps, compress, maxSize), None
+
+def ImageMeta(path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0) -> dict:
+    """Metadata of a compiled image (see CompiledImage) without decoding it,
+    read from the texture cache or else from the image file header.
+    """
+    cached = ReadCache(ImageCacheFile(path, flip, mipmaps, compress, maxSize))
+    if cached is not None:
+        return cached[1]
+
+    # the size and channels DecodeImage would produce
+    with Image.open(path) as img:
+        width, height = img.width, img.height
+        components = len(img.getbands())
+    if maxSize > 0 and max(width, height) > maxSize:
+        scale = maxSize / max(width, height)
+        width, height = max(round(width * scale), 1), max(round(height * scale), 1)
+
+    format = GL_RED if components == 1 else \
+             GL_RGB if components == 3 else \
+             GL_RGBA
+    compressedFormat = CompressedFormat(components) if compress else None
+    levels = max(width, height).bit_length() if mipmaps else 1
+
+    return {"width": width, "height": height, "components": components, "levels": levels,
+            "internalFormat": compressedFormat or format, "compressed": compressedFormat is not None}
+
+def ImageCacheFile(path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0) -> str:
+    """Texture cache file of a compiled image, see CompiledImage.
+    """
+    key = HashKey(ContentHash(path), flip, mipmaps, compress, maxSize, TEXTURE_CACHE_VERSION)
+    name = path + (".mips" if mipmaps else "") + (".compressed" if compress else "") + ("." + str(maxSize) if maxSize > 0 else "")
+    return CacheFile("textures", name, key)
+
+def CompileImage(path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0, decoded: tuple = None) -> tuple[dict, dict]:
+    """Decode an image, unless given its DecodeImage result, and compress
+    its levels, see CompiledImage.
+    """
+    levels, meta = decoded or DecodeImage(path, flip, mipmaps, maxSize)
+
+    compressedFormat = CompressedFormat(meta["components"]) if compress else None
+    if compressedFormat is not None:
+        levels = CompressLevels(levels, meta, compressedFormat)
+        meta = dict(meta, internalFormat=compressedFormat, compressed=True)
+
+    return {"level" + str(i): level for i, level in enumerate(levels)}, meta
+
+def DecodeImage(path: str, flip: bool, mipmaps: bool, maxSize: int = 0) -> tuple[list[np.ndarray], dict]:
+    """Decode an image and build its mip chain (box filtered), without GL.
+
+    Returns:
+        tuple: uint8 levels and the metadata, see CompiledImage.
+    """
+    levels = []
+    with Image.open(path) as img:
+        if flip:
+            img = img.transpose(Image.FLIP_TOP_BOTTOM)
+        if maxSize > 0 and max(img.width, img.height) > maxSize:
+            scale = maxSize / max(img.width, img.height)
+            img = img.resize((max(round(img.width * scale), 1), max(round(img.height * scale), 1)), Image.LANCZOS)
+        components = len(img.getbands())
+        width, height = img.width, img.height
+
+        level = img
+        while True:
+            levels.append(np.frombuffer(level.tobytes(), dtype=np.uint8))
+            if not mipmaps or (level.width == 1 and level.height == 1):
+                break
+            level = level.resize((max(level.width // 2, 1), max(level.height // 2, 1)), Image.BOX)
+
+    format = GL_RED if components == 1 else \
+             GL_RGB if components == 3 else \
+             GL_RGBA
+
+    return levels, {"width": width, "height": height, "components": components, "levels": len(levels), "internalFormat": format, "compressed": False}
+
+def CompressedFormat(components: int) -> int:
+    """GPU-compressed internal format for 1, 3 or 4 channel images, None
+    when the driver has none (BC1/BC3 need EXT_texture_compression_s3tc).
+    """
+    if components == 1:
+        return GL_COMPRESSED_RED_RGTC1
+    if components in (3, 4) and glInitTextureCompressionS3TcEXT():
+        return GL_COMPRESSED_RGB_S3TC_DXT1_EXT if components == 3 else GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
+    return None
+
+def CompressLevels(levels: list[np.ndarray], meta: dict, compressedFormat: int) -> list[np.ndarray]:
+    """Let the driver compress every level and read the blocks back.
+    """
+    format = meta["internalFormat"]
+    compressed = []
+
+    textureId = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureId)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for i, level in enumerate(levels):
+        width, height = max(meta["width"] >> i, 1), max(meta["height"] >> i, 1)
+        glTexImage2D(GL_TEXTURE_2D, i, compressedFormat, width, height, 0, format, GL_UNSIGNED_BYTE, level)
+
+        size = glGetTexLevelParameteriv(GL_TEXTURE_2D, i, GL_TEXTURE_COMPRESSED_IMAGE_SIZE)
+        data = np.empty(int(size), dtype=np.uint8)
+        RawGetCompressedTexImage(GL_TEXTURE_2D, i, data)
+        compressed.append(data)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glDeleteTextures(1, [textureId])
+
+    return compressed
+
+def UploadImage(target: int, arrays: dict, meta: dict, offsets: list[int] = None, layer: int = None) -> int:
+    """Upload every level of a compiled image to the texture bound to target
+    (GL_TEXTURE_2D, a cubemap face or GL_TEXTURE_2D_ARRAY), without
+    glGenerateMipmap.
+
+    Args:
+        offsets (list[int]): When given, the levels are sourced from the
+            bound pixel unpack buffer at these byte offsets instead of arrays.
+        layer (int): Layer of a texture array allocated with
+            TextureArrayFromImages, written in place.
+
+    Returns:
+        int: Bytes uploaded, i.e. the GPU size of the image.
+    """
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+    uploaded = 0
+    format = GL_RED if meta["components"] == 1 else \
+             GL_RGB if meta["components"] == 3 else \
+             GL_RGBA
+    for i in range(meta["levels"]):
+        level = arrays["level" + str(i)]
+        pixels = level if offsets is None else ctypes.c_void_p(offsets[i])
+        width, height = max(meta["width"] >> i, 1), max(meta["height"] >> i, 1)
+        if layer is not None and meta["compressed"]:
+            glCompressedTexSubImage3D(target, i, 0, 0, layer, width, height, 1, meta["internalFormat"], level.nbytes, pixels)
+        elif layer is not None:
+            glTexSubImage3D(target, i, 0, 0, layer, width, height, 1, format, GL_UNSIGNED_BYTE, pixels)
+        elif meta["compressed"]:
+            glCompressedTexImage2D(target, i, meta["internalFormat"], width, height, 0, level.nbytes, pixels)
+        else:
+            glTexImage2D(target, i, meta["internalFormat"], width, height, 0, format, GL_UNSIGNED_BYTE, pixels)
+        uploaded += level.nbytes
+
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+    return uploaded
+
+def LoadTextureImages(textureId: int, bindTarget: int, targets: list[int], paths: list[str], flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0, streamed: bool = False) -> None:
+    """Fill a texture with compiled images, one per target (a single
+    GL_TEXTURE_2D or the six cubemap faces).
+
+    The images are decoded in parallel on the worker threads, the uploads
+    then run in order on the calling (GL) thread, or are queued with
+    QueueTextureUpload when streamed.
+
+    Args:
+        textureId (int): Texture to fill.
+        bindTarget (int): GL_TEXTURE_2D or GL_TEXTURE_CUBE_MAP.
+        targets (list[int]): Upload target of every image.
+        paths (list[str]): Image files.
+        flip, mipmaps, compress, maxSize: see CompiledImage.
+        streamed (bool): Upload in the background, see QueueTextureUpload.
+    """
+    times = _loadTimes.setdefault(textureId, [0.0, 0.0])
+
+    if streamed:
+        for target, path in zip(targets, paths):
+            QueueTextureUpload(textureId, bindTarget, target, path, flip, mipmaps, compress, maxSize)
+        return
+
+    prepared = [_imageWorkers().submit(_timed, PrepareImage, path, flip, mipmaps, compress, maxSize) for path in paths]
+    for target, path, future in zip(targets, paths, prepared):
+        result, seconds = future.result()
+        start = time.perf_counter()
+        compiled = CompiledImage(path, flip, mipmaps, compress, maxSize, result)
+        times[0] += seconds + time.perf_counter() - start
+
+        # bound after compiling, compression goes through a scratch texture
+        start = time.perf_counter()
+        glBindTexture(bindTarget, textureId)
+        UploadImage(target, *compiled)
+        times[1] += time.perf_counter() - start
+
+def PrepareImages(images: list[tuple]) -> list[tuple[dict, dict]]:
+    """Compiled images of several (path, flip, mipmaps, compress) tuples,
+    decoded in parallel on the worker threads and finished on the calling
+    (GL) thread, see CompiledImage.
+    """
+    prepared = [_imageWorkers().submit(PrepareImage, *image) for image in images]
+    return [CompiledImage(*image, prepared=future.result()) for image, future in zip(images, prepared)]
+
+def ImageShape(meta: dict) -> tuple:
+    """Width, height, internal format and levels of a compiled image. Images
+    of the same shape can be layers of one texture array.
+    """
+    return meta["width"], meta["height"], meta["internalFormat"], meta["levels"]
+
+def TextureArrayFromImages(images: list[tuple], metas: list[dict], compiled: list[tuple[dict, dict]] = None) -> int:
+    """GL_TEXTURE_2D_ARRAY with one layer per compiled image, all of the
+    same ImageShape.
+
+    Args:
+        images (list[tuple]): CompiledImage arguments of the layers.
+        metas (list[dict]): Their metadata, see ImageMeta.
+        compiled (list[tuple]): The compiled images (see PrepareImages),
+            uploaded here. None fills the layers in the background (see
+            QueueTextureUpload), only the storage is allocated here.
+
+    Returns:
+        int: Texture id.
+    """
+    meta = metas[0]
+    width, height, internalFormat, levels = ImageShape(meta)
+    format = GL_RED if meta["components"] == 1 else \
+             GL_RGB if meta["components"] == 3 else \
+             GL_RGBA
+
+    textureId = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D_ARRAY, textureId)
+    for i in range(levels):
+        levelWidth, levelHeight = max(width >> i, 1), max(height >> i, 1)
+        if meta["compressed"]:
+            # 4x4 blocks of 8 bytes (BC1, RGTC1) or 16 bytes (BC3)
+            blockBytes = 8 if internalFormat in (GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RED_RGTC1) else 16
+            size = ((levelWidth + 3) // 4) * ((levelHeight + 3) // 4) * blockBytes * len(images)
+            glCompressedTexImage3D(GL_TEXTURE_2D_ARRAY, i, internalFormat, levelWidth, levelHeight, len(images), 0, size, None)
+        else:
+            glTexImage3D(GL_TEXTURE_2D_ARRAY, i, internalFormat, levelWidth, levelHeight, len(images), 0, format, GL_UNSIGNED_BYTE, None)
+
+    for layer, image in enumerate(images):
+        if compiled is None:
+            QueueTextureUpload(textureId, GL_TEXTURE_2D_ARRAY, GL_TEXTURE_2D_ARRAY, *image, layer=layer)
+        else:
+            UploadImage(GL_TEXTURE_2D_ARRAY, *compiled[layer], layer=layer)
+
+    return textureId
+
+def QueueTextureUpload(textureId: int, bindTarget: int, target: int, path: str, flip: bool, mipmaps: bool, compress: bool, maxSize: int = 0, layer: int = None) -> None:
+    """Upload a compiled image (see CompiledImage) in the background.
+
+    A worker thread maps or compiles the image and copies its levels into
+    an orphaned pixel unpack buffer, the render thread then only issues
+    the buffer to texture copies, which return without waiting for the
+    driver, and polls a fence to recycle the buffer. Images that still
+    need a GPU compression pass are compiled on the render thread once.
+
+    Args:
+        textureId (int): Texture to fill, its parameters already set.
+        bindTarget (int): GL_TEXTURE_2D, GL_TEXTURE_CUBE_MAP or GL_TEXTURE_2D_ARRAY.
+        target (int): GL_TEXTURE_2D, a cubemap face or GL_TEXTURE_2D_ARRAY.
+        path, flip, mipmaps, compress, maxSize: see CompiledImage.
+        layer (int): Texture array layer, see UploadImage.
+    """
+    # compression needs the GL context, everything else runs on the worker
+    image = (path, flip, mipmaps, compress, maxSize)
+    load = _imageWorkers().submit(_timed, PrepareImage, *image)
+    _uploads.append(_Upload(textureId, bindTarget, target, image, layer, load))
+
+def ProcessTextureUploads(budget: int = UPLOAD_BUDGET) -> int:
+    """Advance the queued uploads, called on the render thread once a frame.
+
+    Args:
+        budget (int): Bytes to upload at most, at least one image is
+            uploaded. Keeps large images from stalling a single frame.
+
+    Returns:
+        int: Uploads still pending.
+    """
+    uploaded = 0
+    for upload in list(_uploads):
+        if upload.fence is not None:
+            status = glClientWaitSync(upload.fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+            if status in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                glDeleteSync(upload.fence)
+                _stagingBuffers.append(upload.buffer)
+                _uploads.remove(upload)
+
+        elif upload.copy is not None:
+            if not upload.copy.done() or (uploaded > 0 and uploaded >= budget):
+                continue
+            upload.copy.result()
+
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, upload.buffer)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            if not upload.cancelled:
+                start = time.perf_counter()
+                glBindTexture(upload.bindTarget, upload.textureId)
+                uploaded += UploadImage(upload.target, *upload.compiled, upload.offsets, upload.layer)
+                glBindTexture(upload.bindTarget, 0)
+                _loadTimes.setdefault(upload.textureId, [0.0, 0.0])[1] += time.perf_counter() - start
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+            upload.compiled = None
+            upload.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+        elif upload.load.done():
+            if upload.cancelled:
+                _uploads.remove(upload)
+                continue
+            try:
+                prepared, seconds = upload.load.result()
+            except Exception as e:
+                print("Could not load texture '" + upload.image[0] + "':", e, file=sys.stderr)
+                _uploads.remove(upload)
+                continue
+            if prepared[0] is None and uploaded > 0 and uploaded >= budget:
+                continue
+
+            start = time.perf_counter()
+            upload.compiled = CompiledImage(*upload.image, prepared)
+            if prepared[0] is None:
+                uploaded += sum(level.nbytes for level in upload.compiled[0].values())
+            times = _loadTimes.setdefault(upload.textureId, [0.0, 0.0])
+            times[0] += seconds + time.perf_counter() - start
+
+            # levels 16 byte aligned in one buffer
+            arrays, meta = upload.compiled
+            upload.offsets = []
+            size = 0
+            for i in range(meta["levels"]):
+                upload.offsets.append(size)
+                size += (arrays["level" + str(i)].nbytes + 15) // 16 * 16
+
+            upload.buffer = _stagingBuffers.pop() if _stagingBuffers else glGenBuffers(1)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, upload.buffer)
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, size, None, GL_STREAM_DRAW) # orphan the previous contents
+            address = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, size, GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+            upload.copy = _imageWorkers().submit(_stageLevels, address, arrays, meta, upload.offsets)
+
+    return len(_uploads)
+
+def FinishTextureUploads() -> None:
+    """Block until every queued upload is done.
+    """
+    while ProcessTextureUploads(budget=sys.maxsize) > 0:
+        time.sleep(0.001) # let the workers run
+
+def _stageLevels(address: int, arrays: dict, meta: dict, offsets: list[int]) -> None:
+    for i in range(meta["levels"]):
+        level = np.ascontiguousarray(arrays["level" + str(i)])
+        ctypes.memmove(address + offsets[i], level.ctypes.data, level.nbytes)
+
+def _imageWorkers() -> ThreadPoolExecutor:
+    global _workers
+    if _workers is None:
+        _workers = ThreadPoolExecutor(IMAGE_WORKERS, thread_name_prefix="texture")
+    return _workers
+
+def _timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
@@ -66,6 +66,7 @@ TERRAIN_QUEUE = queue.Queue()
 SPOTLIGHT_QUEUE = queue.Queue()
 POINTLIGHT_QUEUE = queue.Queue()
 MODEL_QUEUE = queue.Queue()
+WIDGET_QUEUE = queue.Queue() # (tag, value) of widgets changed by the simulation, set by the GUI thread
 
 """ GUI CLASS """
 
@@ -167,8 +168,13 @@ class ScedGUI:
                     
     def loop(self):
         global SIMULATION_RUNNING
+        global WIDGET_QUEUE
 
         while ScedGUI.dpg.is_dearpygui_running() and SIMULATION_RUNNING:
+            while not WIDGET_QUEUE.empty():
+                tag, value = WIDGET_QUEUE.get()
+                if ScedGUI.dpg.does_item_exist(tag):
+                    ScedGUI.dpg.set_value(tag, value)
             ScedGUI.dpg.render_dearpygui_frame()
         ScedGUI.dpg.destroy_context() 
         
@@ -419,7 +425,7 @@ class ScedGUI:
 
         with ScedGUI.dpg.collapsing_header(tag=modelName+str(modelId), label="Model " + str(modelId) + " (" + modelName + ")", parent=user_data[0]):
             with ScedGUI.dpg.group():
-                flatSource = ScedGUI.dpg.add_input_floatx(label="Position", size=3, default_value=[0,0,0], user_data=(modelName,modelId), callback=ScedGUI.__modelPosition_callback)
+                flatSource = ScedGUI.dpg.add_input_floatx(tag=modelName+str(modelId)+"Position", label="Position", size=3, default_value=[0,0,0], user_data=(modelName,modelId), callback=ScedGUI.__modelPosition_callback)
                 ScedGUI.dpg.add_slider_floatx(source=flatSource, size=3, min_value=-10, max_value=10, default_value=[0,0,0], user_data=(modelName,modelId), callback=ScedGUI.__modelPosition_callback)
             with ScedGUI.dpg.group():
                 flatSource = ScedGUI.dpg.add_input_floatx(label="Scale", size=3, default_value=[1,1,1], user_data=(modelName,modelId), callback=ScedGUI.__modelScale_callback)
@@ -428,6 +434,7 @@ class ScedGUI:
                 flatSource = ScedGUI.dpg.add_input_intx(label="Rotation", size=3, default_value=[0,0,0], user_data=(modelName,modelId), callback=ScedGUI.__modelRotation_callback)
                 ScedGUI.dpg.add_slider_intx(source=flatSource, size=3, min_value=-180, max_value=180, default_value=[0,0,0], user_data=(modelName,modelId), callback=ScedGUI.__modelRotation_callback)
             
+            ScedGUI.dpg.add_button(label="Snap to terrain", user_data=(modelName,modelId), callback=ScedGUI.__snapModel_callback)
             ScedGUI.dpg.add_button(label="Remove", user_data=(modelName,modelId), callback=self.__removeModel_callback)
     
     @staticmethod
@@ -436,6 +443,11 @@ class ScedGUI:
         ScedGUI.dpg.delete_item(user_data[0] + str(user_data[1]))
         MODEL_QUEUE.put((user_data[0], user_data[1], "remove"))
     
+    @staticmethod
+    def __snapModel_callback(sender, app_data: bool, user_data: tuple[str,int]) -> None:
+        global MODEL_QUEUE
+        MODEL_QUEUE.put((user_data[0], user_data[1], "snap"))
+
     @staticmethod
     def __modelPosition_callback(sender, app_data: list[float], user_data: tuple[str, int]) -> None:
         global MODEL_QUEUE
@@ -473,23 +485,44 @@ class Sced:
 
         self.currModels = {}
 
+        self.frameStats = {"terrainDrawCalls": 0, "terrainChunks": "0/0", "terrainTriangles": 0, "models": "0/0", "modelDrawCalls": 0, "modelTextureBinds": 0, "modelTriangles": 0, "textureUploads": 0}
+        self.statsTimer = 0
+
         self.running = True
 
     def render(self):
+        # textures streamed in the background, a bounded slice per frame
+        uploads = ProcessTextureUploads()
+        if uploads == 0 and self.frameStats["textureUploads"] > 0:
+            for skyboxName, (skybox, _) in self._loadedAssets.get("skyboxes", {}).items():
+                print(skyboxName + ":", skybox.loadReport())
+        self.frameStats["textureUploads"] = uploads
+
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glClearColor(*self.__getClearColor())
 
         projection = self.__getProjectionMatrix()
         view = self.__getViewMatrix()
+        frustum = Frustum(projection * view)
 
         self.__loadTerrain()
+        self.frameStats["terrainDrawCalls"] = 0
+        self.frameStats["terrainTriangles"] = 0
+        self.frameStats["modelDrawCalls"] = 0
+        self.frameStats["modelTextureBinds"] = 0
+        self.frameStats["modelTriangles"] = 0
         if self.currTerrain is not None:
             self.currTerrain[1].use()
             model = glm.mat4(1.0)    
             self.currTerrain[1].setMat4("model", model)
             self.currTerrain[1].setMat4("view", view)
             self.currTerrain[1].setMat4("projection", projection)
+            self.currTerrain[0].cull(frustum)
+            self.currTerrain[0].selectLod(self.cameraPos)
             self.currTerrain[0].draw(self.currTerrain[1])
+            self.frameStats["terrainDrawCalls"] = self.currTerrain[0].drawCalls
+            self.frameStats["terrainTriangles"] = self.currTerrain[0].numTriangles
+            self.frameStats["terrainChunks"] = str(len(self.currTerrain[0].visibleChunks)) + "/" + str(self.currTerrain[0].numChunks)
 
         self.__loadDirLight()
         self.__loadSpotLight()
@@ -505,8 +538,8 @@ class Sced:
 
         self.__loadModels()
 
+        instances = []
         for rep in self.currModels.values():
-            objModel, program = rep["object"]
             position = rep["position"]
             scale = rep["scale"]
             rotation = rep["rotation"]
@@ -518,13 +551,42 @@ class Sced:
             model = glm.rotate(model, glm.radians(rotation[1]), glm.vec3(0,1,0))
             model = glm.rotate(model, glm.radians(rotation[2]), glm.vec3(0,0,1))
 
+            instances.append((rep, model))
+
+        # world space boxes of all instances, tested against the frustum in one go
+        visible = []
+        if len(instances) > 0:
+            boxes = [TransformBox(rep["object"][0].boundsMin, rep["object"][0].boundsMax, model) for rep, model in instances]
+            visible = frustum.testBoxes(np.array([box[0] for box in boxes]), np.array([box[1] for box in boxes])).tolist()
+        self.frameStats["models"] = str(sum(visible)) + "/" + str(len(instances))
+
+        for (rep, model), isVisible in zip(instances, visible):
+            if not isVisible:
+                continue
+
+            objModel, program = rep["object"]
+            scale = rep["scale"]
+
             program.use()
             program.setFloat("shininess", 32.0)
             self.lightManager.setUniforms(program, self.cameraPos, self.cameraFront)
-            program.setMat4("model", model)
+            if self.currSkybox is not None:
+                self.currSkybox[0].setLighting(program)
+            else:
+                Skybox.disableLighting(program)
+            program.setMat4("model", model * objModel.dequantization)
             program.setMat4("view", view)
             program.setMat4("projection", projection)
-            objModel.draw(program)
+
+            # level of detail from the projected size of the (scaled) bounding sphere
+            center = glm.vec3(model * glm.vec4(objModel.sphereCenter, 1.0))
+            radius = objModel.sphereRadius * max(abs(s) for s in scale)
+            level = objModel.selectLod(ScreenSize(center, radius, self.cameraPos, projection))
+
+            objModel.draw(program, level)
+            self.frameStats["modelDrawCalls"] += objModel.drawCalls
+            self.frameStats["modelTextureBinds"] += objModel.textureBinds
+            self.frameStats["modelTriangles"] += objModel.numTriangles
 
         self.__loadSkybox()
         if self.currSkybox is not None:
@@ -541,6 +603,7 @@ class Sced:
         global SIMULATION_RUNNING
  
         glEnable(GL_DEPTH_TEST)
+        glEnable(GL_TEXTURE_CUBE_MAP_SEAMLESS) # the rough lighting levels are a few texels per face
 
         deltaTime = 0
         while self.running and SIMULATION_RUNNING:
@@ -555,6 +618,7 @@ class Sced:
                 
             pg.display.flip()
             deltaTime = self.clock.tick(60) / 1000
+            self.__updateStats(deltaTime)
         
         SIMULATION_RUNNING = False
         
@@ -567,6 +631,18 @@ class Sced:
                 if event.key == pg.K_s:
                     self.__saveScene()
 
+    def __updateStats(self, deltaTime: float) -> None:
+        # refresh the window caption with the last frame statistics once per second
+        self.statsTimer += deltaTime
+        if self.statsTimer < 1.0:
+            return
+        self.statsTimer = 0
+
+        caption = "Sced | %.0f fps" % self.clock.get_fps()
+        for name, value in self.frameStats.items():
+            caption += " | " + name + ": " + str(value)
+        pg.display.set_caption(caption)
+
     def __getClearColor(self):
         global CONFIGURATION_VALUES
         return CONFIGURATION_VALUES["clearColor"]
@@ -647,7 +723,8 @@ class Sced:
                         raise RuntimeError(message)
                 
                 faces = [join(path, kn+"."+extension) for kn in keyNames]
-                skybox = Skybox(faces)
+                skybox = Skybox(faces, ASSETS["skyboxes"][skyboxName].get("compress", True), streamed=True, maxSize=ASSETS["skyboxes"][skyboxName].get("maxSize", 0),
+                                lighting=ASSETS["skyboxes"][skyboxName].get("lighting", True))
                 
                 # Create Shader Program
                 vsCode = open(vsPath, "r")
@@ -680,7 +757,12 @@ class Sced:
                     message = "Height Map path for '" + heightmapName + "' is not a file!"
                     raise RuntimeError(message)
                 
-                terrain = HeightMapTerrain(path)
+                mode = ASSETS["heightmaps"][heightmapName].get("mode", HeightMapTerrain.MODE_MESH)
+                if mode == StreamingTerrain.MODE_STREAMING:
+                    terrain = StreamingTerrain(path, ASSETS["heightmaps"][heightmapName].get("size"))
+                else:
+                    terrain = HeightMapTerrain(path, mode)
+                print(heightmapName + ":", terrain.memoryReport())
 
                 # Create Shader Program
                 vsCode = open(vsPath, "r")
@@ -730,12 +812,15 @@ class Sced:
                     message = "Model path for '" + modelName + "' is not a file!"
                     raise RuntimeError(message)
                 
-                model = Model(path)
+                vertexFormat = ASSETS["models"][modelName].get("vertexFormat", Vertex.FORMAT_FLOAT)
+                materials = ASSETS["models"][modelName].get("materials", Model.MATERIALS_TEXTURES)
+                model = Model(path, vertexFormat, streamed=True, materials=materials)
+                print(modelName + ":", model.meshReport())
                 
                 # Create Shader Program
                 vsCode = open(vsPath, "r")
                 fgCode = open(fgPath, "r")
-                program = ShaderProgram(vsCode.read(), fgCode.read())
+                program = ShaderProgram(vsCode.read(), fgCode.read(), defines=["MATERIAL_ARRAYS"] if materials == Model.MATERIALS_ARRAY else None)
                 vsCode.close()
                 fgCode.close()
                 
@@ -750,6 +835,8 @@ class Sced:
         self.__drawProgressBar(progress)
         
         print("Assets Loaded")
+        print("Shared textures: %d (%d references)" % TextureStats())
+        print("Shared geometries: %d (%d references)" % GeometryStats())
 
 
     def __loadSkybox(self) -> None:
@@ -847,7 +934,9 @@ class Sced:
 
     def __loadModels(self) -> None:
         global MODEL_QUEUE
+        global WIDGET_QUEUE
         
+        snapped = []
         while not MODEL_QUEUE.empty():
             info = MODEL_QUEUE.get()
             if len(info) <= 3:
@@ -860,6 +949,8 @@ class Sced:
                     self.currModels[modelName+str(modelId)]["rotation"] = glm.vec3(0)
                 elif action == "remove":
                     del self.currModels[modelName+str(modelId)]
+                elif action == "snap":
+                    snapped.append(modelName+str(modelId))
                 else:
                     print("Invalid Model Action: ", action)
                     return
@@ -880,6 +971,16 @@ class Sced:
                     print("Invalid Model Action: ", action)
                     return
 
+        # place every model to snap on the terrain surface with a single query
+        snapped = [key for key in snapped if key in self.currModels.keys()]
+        if len(snapped) > 0 and self.currTerrain is not None:
+            positions = [self.currModels[key]["position"] for key in snapped]
+            heights, _ = self.currTerrain[0].sample([p.x for p in positions], [p.z for p in positions])
+            for key, position, height in zip(snapped, positions, heights.tolist()):
+                self.currModels[key]["position"] = glm.vec3(position.x, height, position.z)
+                # the Position widgets (the slider follows the input) show the new height, so the next edit keeps it
+                WIDGET_QUEUE.put((key + "Position", [position.x, height, position.z]))
+
     def __drawProgressBar(self, percentage: float) -> None:
         # represent percentage as a float between [0,1]
         percentage /= 100
@@ -53,20 +53,40 @@ uniform bool enableSpotLight;
 
 uniform float shininess;
 
+// image based lighting from the current skybox, tints the directional ambient colour
+uniform bool enableIBL;
+uniform samplerCube irradianceMap;
+uniform samplerCube prefilteredMap;
+uniform float prefilteredLevels;
+
+#ifdef MATERIAL_ARRAYS
+// maps packed into texture array layers, the layers selected per draw (-1: no map)
+uniform sampler2DArray material_diffuse;
+uniform sampler2DArray material_specular;
+uniform sampler2DArray material_normal;
+uniform sampler2DArray material_height;
+uniform ivec4 materialLayers;
+#else
 uniform sampler2D texture_difuse1;
 uniform sampler2D texture_specular1;
 uniform sampler2D texture_normal1;
 uniform sampler2D texture_height1;
+#endif
 
 // prototypes
 vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir);
 vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
 vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
+vec3 DiffuseMap();
+vec3 SpecularMap();
+vec3 NormalMap();
+vec3 AmbientLight(vec3 normal);
+vec3 AmbientReflection(vec3 normal, vec3 viewDir);
 
 void main()
 {
     // vec3 norm = normalize(Normal);
-    vec3 norm = Normal + texture(texture_normal1, TexCoords).rgb;
+    vec3 norm = Normal + NormalMap();
     norm = normalize(norm * 2.0 - 1.0);
 
     vec3 viewDir = normalize(viewPos - FragPos);
@@ -94,9 +114,10 @@ vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir)
     vec3 reflectDir = reflect(-lightDir, normal);
     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
     // combine results
-    vec3 ambient = light.ambient * vec3(texture(texture_difuse1, TexCoords));
-    vec3 diffuse = light.diffuse * diff * vec3(texture(texture_difuse1, TexCoords));
-    vec3 specular = light.specular * spec * vec3(texture(texture_specular1, TexCoords));
+    vec3 ambient = light.ambient * AmbientLight(normal) * DiffuseMap();
+    vec3 diffuse = light.diffuse * diff * DiffuseMap();
+    vec3 specular = light.specular * spec * SpecularMap();
+    specular += light.ambient * AmbientReflection(normal, viewDir) * SpecularMap();
     return (ambient + diffuse + specular);
 }
 
@@ -113,9 +134,9 @@ vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
     float distance = length(light.position - fragPos);
     float attenuation = 1.0 / (light.constant + light.linear * distance + light.quadratic * (distance * distance));    
     // combine results
-    vec3 ambient = light.ambient * vec3(texture(texture_difuse1, TexCoords));
-    vec3 diffuse = light.diffuse * diff * vec3(texture(texture_difuse1, TexCoords));
-    vec3 specular = light.specular * spec * vec3(texture(texture_specular1, TexCoords));
+    vec3 ambient = light.ambient * DiffuseMap();
+    vec3 diffuse = light.diffuse * diff * DiffuseMap();
+    vec3 specular = light.specular * spec * SpecularMap();
     ambient *= attenuation;
     diffuse *= attenuation;
     specular *= attenuation;
@@ -139,11 +160,68 @@ vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
     float epsilon = light.cutOff - light.outerCutOff;
     float intensity = clamp((theta - light.outerCutOff) / epsilon, 0.0, 1.0);
     // combine results
-    vec3 ambient = light.ambient * vec3(texture(texture_difuse1, TexCoords));
-    vec3 diffuse = light.diffuse * diff * vec3(texture(texture_difuse1, TexCoords));
-    vec3 specular = light.specular * spec * vec3(texture(texture_specular1, TexCoords));
+    vec3 ambient = light.ambient * DiffuseMap();
+    vec3 diffuse = light.diffuse * diff * DiffuseMap();
+    vec3 specular = light.specular * spec * SpecularMap();
     ambient *= attenuation * intensity;
     diffuse *= attenuation * intensity;
     specular *= attenuation * intensity;
     return (ambient + diffuse + specular);
 }
+
+#ifdef MATERIAL_ARRAYS
+vec3 SampleLayer(sampler2DArray map, int layer)
+{
+    if(layer < 0) {
+        return vec3(0.0);
+    }
+    return vec3(texture(map, vec3(TexCoords, layer)));
+}
+#endif
+
+// material maps, from separate textures or texture array layers
+vec3 DiffuseMap()
+{
+#ifdef MATERIAL_ARRAYS
+    return SampleLayer(material_diffuse, materialLayers.x);
+#else
+    return vec3(texture(texture_difuse1, TexCoords));
+#endif
+}
+
+vec3 SpecularMap()
+{
+#ifdef MATERIAL_ARRAYS
+    return SampleLayer(material_specular, materialLayers.y);
+#else
+    return vec3(texture(texture_specular1, TexCoords));
+#endif
+}
+
+vec3 NormalMap()
+{
+#ifdef MATERIAL_ARRAYS
+    return SampleLayer(material_normal, materialLayers.z);
+#else
+    return texture(texture_normal1, TexCoords).rgb;
+#endif
+}
+
+// ambient light from the irradiance map, white without one
+vec3 AmbientLight(vec3 normal)
+{
+    if(!enableIBL) {
+        return vec3(1.0);
+    }
+    return texture(irradianceMap, normal).rgb;
+}
+
+// reflected sky from the pre-filtered map, the level of roughness r being r * (levels - 1)
+vec3 AmbientReflection(vec3 normal, vec3 viewDir)
+{
+    if(!enableIBL) {
+        return vec3(0.0);
+    }
+    float roughness = sqrt(2.0 / (shininess + 2.0)); // Blinn-Phong exponent to roughness
+    return textureLod(prefilteredMap, reflect(-viewDir, normal), roughness * (prefilteredLevels - 1.0)).rgb;
+}
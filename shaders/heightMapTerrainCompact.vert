@@ -0,0 +1,39 @@
+#version 330 core
+layout (location = 0) in float aHeight;
+
+out float Height;
+out vec3 Position;
+
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+
+uniform float yScale;
+uniform float yShift;
+
+uniform int chunkSize;
+uniform int chunkCols;
+uniform int terrainWidth;
+uniform int terrainHeight;
+
+// first row and column of the vertex buffer, for terrains streamed in tiles
+uniform int originRow;
+uniform int originCol;
+
+void main()
+{
+    // vertices are laid out chunk by chunk, (chunkSize+1)^2 per chunk, and
+    // gl_VertexID already includes the chunk base vertex
+    int blockSize = chunkSize + 1;
+    int chunk = gl_VertexID / (blockSize * blockSize);
+    int local = gl_VertexID % (blockSize * blockSize);
+
+    int row = min(originRow + (chunk / chunkCols) * chunkSize + local / blockSize, terrainHeight - 1);
+    int col = min(originCol + (chunk % chunkCols) * chunkSize + local % blockSize, terrainWidth - 1);
+
+    vec3 aPos = vec3(-terrainHeight/2.0 + row, aHeight * yScale - yShift, -terrainWidth/2.0 + col);
+
+    Height = aPos.y;
+    Position = (view * model * vec4(aPos, 1.0)).xyz;
+    gl_Position = projection * view * model * vec4(aPos, 1.0);
+}
@@ -0,0 +1,36 @@
+#version 330 core
+
+out float Height;
+out vec3 Position;
+
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+
+uniform sampler2D heightMap;
+uniform float heightMax;
+uniform float yScale;
+uniform float yShift;
+
+uniform int chunkSize;
+uniform int chunkCols;
+
+void main()
+{
+    // vertices are laid out chunk by chunk, (chunkSize+1)^2 per chunk, and
+    // gl_VertexID already includes the chunk base vertex
+    int blockSize = chunkSize + 1;
+    int chunk = gl_VertexID / (blockSize * blockSize);
+    int local = gl_VertexID % (blockSize * blockSize);
+
+    ivec2 size = textureSize(heightMap, 0);
+    int row = min((chunk / chunkCols) * chunkSize + local / blockSize, size.y - 1);
+    int col = min((chunk % chunkCols) * chunkSize + local % blockSize, size.x - 1);
+
+    float y = texelFetch(heightMap, ivec2(col, row), 0).r * heightMax;
+    vec3 aPos = vec3(-size.y/2.0 + row, y * yScale - yShift, -size.x/2.0 + col);
+
+    Height = aPos.y;
+    Position = (view * model * vec4(aPos, 1.0)).xyz;
+    gl_Position = projection * view * model * vec4(aPos, 1.0);
+}